@@ -367,3 +367,45 @@ export class CrudManager {
         }
     }
 }
+
+/**
+ * Obtiene el dominio del contenedor de la tabla o, en su defecto, de la URL actual
+ */
+function getDominio(container) {
+    if (container && container.dataset.dominio) {
+        return container.dataset.dominio;
+    }
+
+    // Alternativa: extraer del path
+    const pathParts = window.location.pathname.split('/');
+    return pathParts[1] || '';
+}
+
+/**
+ * Crea un CrudManager por cada contenedor con data-crud-config
+ *
+ * La configuración (JSON) la genera convert_crud_to_datatable.py en el index de cada
+ * entidad, así un solo módulo cacheable sirve a todos los listados.
+ *
+ * @param {ParentNode} root - Nodo donde buscar los contenedores
+ * @returns {CrudManager[]}
+ */
+export function initCrudManagers(root = document) {
+    return Array.from(root.querySelectorAll('[data-crud-config]')).map(container => {
+        const { globalName, ...config } = JSON.parse(container.dataset.crudConfig);
+        const manager = new CrudManager({ ...config, dominio: getDominio(container) });
+
+        // Hacer disponible globalmente si es necesario
+        if (globalName) {
+            window[globalName] = manager;
+        }
+
+        return manager;
+    });
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', () => initCrudManagers());
+} else {
+    initCrudManagers();
+}
@@ -7,17 +7,29 @@ Usage:
     python convert_crud_to_datatable.py --entity company
     python convert_crud_to_datatable.py --all --entities company,region
     python convert_crud_to_datatable.py --entity company --dry-run
+    python convert_crud_to_datatable.py --all --entities company,region,beneficiary --jobs 3
+    python convert_crud_to_datatable.py --entity company --profile --cprofile var/profile
 """
 
+import io
 import re
+import html
 import os
 import sys
+import json
+import time
 import argparse
-import shutil
+import cProfile
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
 from pathlib import Path
 from datetime import datetime
 from typing import Dict, List, Optional, Tuple
 
+from project_index import ProjectIndex
+from staged_writes import StagedWrites
+
 # Configuration for each CRUD entity
 CRUD_CONFIG = {
     'company': {
@@ -78,10 +90,52 @@ class Colors:
     BOLD = '\033[1m'
     UNDERLINE = '\033[4m'
 
+class StepProfile:
+    """Per-step wall time, bytes read/written and regex time of one conversion"""
+    
+    def __init__(self):
+        self.steps: Dict[str, Dict[str, float]] = {}
+        self.current: Optional[Dict[str, float]] = None
+    
+    @contextmanager
+    def step(self, name: str):
+        """Attribute everything recorded inside the block to step name"""
+        stats = self.steps.setdefault(name, {'wall_s': 0.0, 'bytes_read': 0, 'bytes_written': 0, 'regex_s': 0.0})
+        previous, self.current = self.current, stats
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats['wall_s'] += time.perf_counter() - start
+            self.current = previous
+    
+    def add(self, key: str, amount: float):
+        if self.current is not None:
+            self.current[key] += amount
+    
+    def regex(self, func, *args, **kwargs):
+        """Call a regex (or index lookup) function, timing it as regex work"""
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.add('regex_s', time.perf_counter() - start)
+    
+    def as_dict(self) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {key: round(value, 6) if isinstance(value, float) else value for key, value in stats.items()}
+            for name, stats in self.steps.items()
+        }
+
+
 class CrudConverter:
-    """Converts traditional CRUD templates to DataTables modular architecture"""
+    """Converts traditional CRUD templates to DataTables modular architecture
+
+    Outputs are staged in self.stage; nothing is written until the caller commits it.
+    """
     
-    def __init__(self, crud_name: str, project_root: str = '.', dry_run: bool = False):
+    def __init__(self, crud_name: str, project_root: str = '.', dry_run: bool = False,
+                 index: Optional[ProjectIndex] = None, stage: Optional[StagedWrites] = None):
         if crud_name not in CRUD_CONFIG:
             raise ValueError(f"Entity '{crud_name}' not found in CRUD_CONFIG")
         
@@ -89,13 +143,16 @@ class CrudConverter:
         self.config = CRUD_CONFIG[crud_name]
         self.project_root = Path(project_root)
         self.dry_run = dry_run
+        # A caller-provided index is saved by the caller; one created here is saved by convert()
+        self.owns_index = index is None
+        self.index = index if index is not None else ProjectIndex(project_root)
+        self.profile = StepProfile()
+        self.stage = stage if stage is not None else StagedWrites()
         
         # Paths
         self.template_dir = self.project_root / 'templates' / crud_name
-        self.js_dir = self.project_root / 'assets' / 'js' / 'crud'
         self.original_index = self.template_dir / 'index.html.twig'
         self.table_content = self.template_dir / '_table_content.html.twig'
-        self.crud_js = self.js_dir / f'{crud_name}-crud.js'
         
     def log(self, message: str, color: str = Colors.OKBLUE):
         """Print colored log message"""
@@ -115,8 +172,11 @@ class CrudConverter:
             return True
         
         try:
-            shutil.copy2(self.original_index, backup_path)
-            self.log(f"✅ Backup created: {backup_path}", Colors.OKGREEN)
+            self.stage.copy(self.original_index, backup_path)
+            size = self.original_index.stat().st_size
+            self.profile.add('bytes_read', size)
+            self.profile.add('bytes_written', size)
+            self.log(f"✅ Backup staged: {backup_path}", Colors.OKGREEN)
             return True
         except Exception as e:
             self.log(f"❌ Failed to create backup: {e}", Colors.FAIL)
@@ -130,19 +190,17 @@ class CrudConverter:
         
         with open(self.original_index, 'r', encoding='utf-8') as f:
             content = f.read()
+        self.profile.add('bytes_read', len(content.encode('utf-8')))
         
-        # Find table block
-        table_match = re.search(
-            r'<table[^>]*>.*?</table>',
-            content,
-            re.DOTALL
-        )
+        # Find table block (spans are cached in the shared project index)
+        tables = self.profile.regex(self.index.facts, self.original_index)['tables']
         
-        if not table_match:
+        if not tables:
             self.log("❌ No table found in template", Colors.FAIL)
             return None
         
-        table_html = table_match.group(0)
+        start, end = tables[0]
+        table_html = content[start:end]
         self.log("✅ Table content extracted", Colors.OKGREEN)
         return table_html
     
@@ -157,7 +215,8 @@ class CrudConverter:
 </div>
 '''
         # Update table tag to use new ID and classes
-        template = re.sub(
+        template = self.profile.regex(
+            re.sub,
             r'<table[^>]*>',
             f'<table id="{self.config["table_id"]}" class="styled-table display compact nowrap w-100">',
             template,
@@ -165,7 +224,8 @@ class CrudConverter:
         )
         
         # Ensure thead has proper class
-        template = re.sub(
+        template = self.profile.regex(
+            re.sub,
             r'<thead[^>]*>',
             '<thead class="table-primary text-dark">',
             template
@@ -212,6 +272,7 @@ class CrudConverter:
         {{# CONTENEDOR DINÁMICO PARA LA TABLA #}}
         <div id="table-ajax-container" 
              data-dominio="{{{{ dominio }}}}" 
+             data-crud-config="{self.crud_config_attribute()}"
              class="px-4">
             {{{{ include('{self.crud_name}/_table_content.html.twig') }}}}
         </div>
@@ -221,109 +282,65 @@ class CrudConverter:
 {{%% block javascripts %%}}
     {{{{ parent() }}}}
     <script src="{{{{ asset('js/dataTables.min.js') }}}}"></script>
-    <script src="{{{{ asset('js/crud/{self.crud_name}-crud.js') }}}}" type="module"></script>
+    <script src="{{{{ asset('js/crud/crud-manager.js') }}}}" type="module"></script>
 {{%% endblock %%}}
 '''
         return template.strip()
     
-    def generate_crud_js(self) -> str:
-        """Generate entity-crud.js file"""
-        
-        # Build columnDefs
-        column_defs = []
-        column_defs.append(
-            "            {\n"
-            f"                targets: {len(self.config['columns']) - 1}, // Columna de acciones\n"
-            "                orderable: false,\n"
-            "                searchable: false\n"
-            "            }"
-        )
-        
-        # Add custom widths
+    def crud_config(self) -> Dict:
+        """CrudManager configuration, read by crud-manager.js from data-crud-config"""
+        column_defs = [{
+            'targets': len(self.config['columns']) - 1,  # Columna de acciones
+            'orderable': False,
+            'searchable': False,
+        }]
         for col_idx, width in self.config.get('column_widths', {}).items():
-            column_defs.append(
-                "            {\n"
-                f"                targets: {col_idx},\n"
-                f"                width: '{width}'\n"
-                "            }"
-            )
-        
-        column_defs_str = ',\n'.join(column_defs)
-        
-        js_content = f'''/**
- * {self.config['entity_name_plural'].capitalize()} CRUD - Configuración específica
- */
-
-import {{ CrudManager }} from './crud-manager.js';
-
-/**
- * Obtiene el dominio de la URL actual
- */
-function getDominio() {{
-    const container = document.getElementById('table-ajax-container');
-    if (container && container.dataset.dominio) {{
-        return container.dataset.dominio;
-    }}
-    
-    // Alternativa: extraer del path
-    const pathParts = window.location.pathname.split('/');
-    return pathParts[1] || '';
-}}
+            column_defs.append({'targets': col_idx, 'width': width})
 
-/**
- * Inicializa el CRUD de {self.config['entity_name_plural']} cuando el DOM esté listo
- */
-document.addEventListener('DOMContentLoaded', function() {{
-    const dominio = getDominio();
-    
-    // Configuración específica para {self.config['entity_name_plural']}
-    const {self.crud_name}Crud = new CrudManager({{
-        tableId: '{self.config['table_id']}',
-        dominio: dominio,
-        entityName: '{self.config['entity_name']}',
-        entityNamePlural: '{self.config['entity_name_plural']}',
-        
-        // Definiciones de columnas específicas
-        columnDefs: [
-{column_defs_str}
-        ],
-        
-        // Opciones adicionales de DataTable
-        dataTableOptions: {{
-            pageLength: 25,
-            order: [[0, 'asc']], // Ordenar por primera columna
-            responsive: true,
-            autoWidth: false
-        }}
-    }});
+        return {
+            'globalName': f'{self.crud_name}CrudManager',
+            'tableId': self.config['table_id'],
+            'entityName': self.config['entity_name'],
+            'entityNamePlural': self.config['entity_name_plural'],
+            'columnDefs': column_defs,
+            'dataTableOptions': {
+                'pageLength': 25,
+                'order': [[0, 'asc']],  # Ordenar por primera columna
+                'responsive': True,
+                'autoWidth': False,
+            },
+        }
 
-    // Hacer disponible globalmente si es necesario
-    window.{self.crud_name}CrudManager = {self.crud_name}Crud;
-    
-    console.log('{self.config['entity_name_plural'].capitalize()} CRUD Manager inicializado correctamente');
-}});
-'''
-        return js_content.strip()
+    def crud_config_attribute(self) -> str:
+        """crud_config() as an HTML-escaped JSON attribute value"""
+        return html.escape(json.dumps(self.crud_config(), ensure_ascii=False), quote=True)
     
     def write_file(self, path: Path, content: str) -> bool:
-        """Write content to file"""
+        """Stage content for path"""
         if self.dry_run:
             self.log(f"[DRY RUN] Would write to: {path}", Colors.WARNING)
             self.log(f"[DRY RUN] Content preview (first 200 chars):\n{content[:200]}...\n", Colors.OKCYAN)
             return True
         
         try:
-            path.parent.mkdir(parents=True, exist_ok=True)
-            with open(path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            self.log(f"✅ Created: {path}", Colors.OKGREEN)
+            self.stage.write(path, content)
+            self.profile.add('bytes_written', len(content.encode('utf-8')))
+            self.log(f"✅ Staged: {path}", Colors.OKGREEN)
             return True
         except Exception as e:
-            self.log(f"❌ Failed to write {path}: {e}", Colors.FAIL)
+            self.log(f"❌ Failed to stage {path}: {e}", Colors.FAIL)
             return False
     
     def convert(self) -> bool:
         """Execute full conversion"""
+        try:
+            return self.run_steps()
+        finally:
+            if self.owns_index:
+                self.index.save()
+    
+    def run_steps(self) -> bool:
+        """Backup, extract and stage the generated templates, stopping at the first failed step"""
         self.log(f"\n{'='*60}", Colors.HEADER)
         self.log(f"Converting {self.crud_name.upper()} CRUD to DataTables", Colors.HEADER)
         self.log(f"{'='*60}\n", Colors.HEADER)
@@ -333,32 +350,30 @@ document.addEventListener('DOMContentLoaded', function() {{
         
         # Step 1: Backup original
         self.log("📦 Step 1: Creating backup...", Colors.BOLD)
-        if not self.backup_original():
-            return False
+        with self.profile.step('backup'):
+            if not self.backup_original():
+                return False
         
         # Step 2: Extract table
         self.log("\n📋 Step 2: Extracting table content...", Colors.BOLD)
-        table_html = self.extract_table_content()
-        if not table_html:
-            return False
+        with self.profile.step('extract'):
+            table_html = self.extract_table_content()
+            if not table_html:
+                return False
         
         # Step 3: Generate _table_content.html.twig
         self.log("\n🔨 Step 3: Generating _table_content.html.twig...", Colors.BOLD)
-        table_content = self.generate_table_content_template(table_html)
-        if not self.write_file(self.table_content, table_content):
-            return False
+        with self.profile.step('table_content'):
+            table_content = self.generate_table_content_template(table_html)
+            if not self.write_file(self.table_content, table_content):
+                return False
         
         # Step 4: Generate clean index.html.twig
         self.log("\n🔨 Step 4: Generating clean index.html.twig...", Colors.BOLD)
-        clean_index = self.generate_clean_index_template()
-        if not self.write_file(self.original_index, clean_index):
-            return False
-        
-        # Step 5: Generate entity-crud.js
-        self.log("\n🔨 Step 5: Generating {}-crud.js...".format(self.crud_name), Colors.BOLD)
-        crud_js = self.generate_crud_js()
-        if not self.write_file(self.crud_js, crud_js):
-            return False
+        with self.profile.step('index'):
+            clean_index = self.generate_clean_index_template()
+            if not self.write_file(self.original_index, clean_index):
+                return False
         
         # Summary
         self.log(f"\n{'='*60}", Colors.OKGREEN)
@@ -369,7 +384,6 @@ document.addEventListener('DOMContentLoaded', function() {{
             self.log("Files created/modified:", Colors.BOLD)
             self.log(f"  ✓ {self.table_content}")
             self.log(f"  ✓ {self.original_index}")
-            self.log(f"  ✓ {self.crud_js}")
             
             self.log("\nNext steps:", Colors.WARNING)
             self.log("  1. Review the generated files")
@@ -379,6 +393,69 @@ document.addEventListener('DOMContentLoaded', function() {{
         return True
 
 
+def convert_entity(entity: str, project_root: str, dry_run: bool, stage: StagedWrites,
+                   index: Optional[ProjectIndex] = None,
+                   profile: bool = False, cprofile_dir: Optional[str] = None) -> Tuple[bool, Optional[Dict]]:
+    """Convert a single entity, reporting failures instead of raising
+
+    The entity's outputs are merged into stage only if every step succeeded.
+    Returns the success flag and, when profiling, the entity's profile record.
+    """
+    success = False
+    converter = None
+    profiler = cProfile.Profile() if profile and cprofile_dir else None
+    start = time.perf_counter()
+    try:
+        converter = CrudConverter(entity, project_root, dry_run, index)
+        if profiler:
+            profiler.enable()
+        try:
+            success = converter.convert()
+        finally:
+            if profiler:
+                profiler.disable()
+        if success:
+            stage.update(converter.stage)
+        else:
+            print(f"{Colors.FAIL}Failed to convert {entity}{Colors.ENDC}")
+    except Exception as e:
+        print(f"{Colors.FAIL}Error converting {entity}: {e}{Colors.ENDC}")
+        traceback.print_exc()
+    
+    if not profile:
+        return success, None
+    
+    record = {
+        'entity': entity,
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'dry_run': dry_run,
+        'success': success,
+        'total_s': round(time.perf_counter() - start, 6),
+        'steps': converter.profile.as_dict() if converter else {},
+    }
+    if profiler:
+        os.makedirs(cprofile_dir, exist_ok=True)
+        record['cprofile'] = os.path.join(cprofile_dir, f'{entity}.prof')
+        profiler.dump_stats(record['cprofile'])
+    return success, record
+
+
+def convert_entity_buffered(entity: str, project_root: str, dry_run: bool,
+                            profile: bool = False, cprofile_dir: Optional[str] = None
+                            ) -> Tuple[bool, str, Optional[Dict], StagedWrites, Tuple[Dict, List[str]]]:
+    """Worker entry point: convert an entity and return its log, staged files and index changes instead of applying them
+
+    The parent merges every worker's index changes and saves the index once, so
+    concurrent workers never overwrite each other's entries.
+    """
+    output = io.StringIO()
+    stage = StagedWrites()
+    with redirect_stdout(output), redirect_stderr(output):
+        index = ProjectIndex(project_root)
+        success, record = convert_entity(entity, project_root, dry_run, stage, index, profile, cprofile_dir)
+    return success, output.getvalue(), record, stage, index.changes()
+
+
 def main():
     parser = argparse.ArgumentParser(
         description='Convert Symfony Twig CRUDs to DataTables architecture',
@@ -388,6 +465,8 @@ Examples:
   %(prog)s --entity company
   %(prog)s --entity company --dry-run
   %(prog)s --all --entities company,region
+  %(prog)s --all --entities company,region,beneficiary --jobs 3
+  %(prog)s --entity company --profile --cprofile var/profile
         '''
     )
     
@@ -423,6 +502,28 @@ Examples:
         help='Path to project root (default: current directory)'
     )
     
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=1,
+        help='Number of entities to convert in parallel (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        nargs='?',
+        const='crud_profile.jsonl',
+        metavar='FILE',
+        help='Append per-step timings of each entity as JSON lines (default: crud_profile.jsonl)'
+    )
+    
+    parser.add_argument(
+        '--cprofile',
+        type=str,
+        metavar='DIR',
+        help='With --profile, also dump cProfile stats to DIR/<entity>.prof'
+    )
+    
     args = parser.parse_args()
     
     # Determine entities to convert
@@ -445,17 +546,56 @@ Examples:
     
     # Convert each entity
     success_count = 0
-    for entity in entities_to_convert:
-        try:
-            converter = CrudConverter(entity, args.project_root, args.dry_run)
-            if converter.convert():
+    records = []
+    stage = StagedWrites()
+    profile = bool(args.profile)
+    jobs = min(max(args.jobs, 1), len(entities_to_convert))
+    
+    index = ProjectIndex(args.project_root)
+    if jobs > 1:
+        # Each worker buffers its own log; print them whole, in the requested order
+        count = len(entities_to_convert)
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            results = executor.map(
+                convert_entity_buffered,
+                entities_to_convert,
+                [args.project_root] * count,
+                [args.dry_run] * count,
+                [profile] * count,
+                [args.cprofile] * count
+            )
+            for success, output, record, entity_stage, (updated, removed) in results:
+                sys.stdout.write(output)
+                sys.stdout.flush()
+                index.merge(updated, removed)
+                if success:
+                    success_count += 1
+                    stage.update(entity_stage)
+                if record:
+                    records.append(record)
+    else:
+        for entity in entities_to_convert:
+            success, record = convert_entity(entity, args.project_root, args.dry_run, stage, index, profile, args.cprofile)
+            if success:
                 success_count += 1
-            else:
-                print(f"{Colors.FAIL}Failed to convert {entity}{Colors.ENDC}")
-        except Exception as e:
-            print(f"{Colors.FAIL}Error converting {entity}: {e}{Colors.ENDC}")
-            import traceback
-            traceback.print_exc()
+            if record:
+                records.append(record)
+    index.save()
+    
+    # Apply every staged output in one batch; a failure here leaves the tree untouched
+    if stage:
+        try:
+            written = stage.commit()
+            print(f"{Colors.OKGREEN}💾 Wrote {written} files{Colors.ENDC}")
+        except OSError as e:
+            print(f"{Colors.FAIL}❌ Failed to write the converted files, nothing was changed: {e}{Colors.ENDC}")
+            success_count = 0
+    
+    if profile:
+        with open(args.profile, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        print(f"{Colors.OKCYAN}📈 Profile written to {args.profile}{Colors.ENDC}")
     
     # Final summary
     print(f"\n{Colors.BOLD}{'='*60}{Colors.ENDC}")
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Datatable Index Migration Generator
+Emits a Doctrine migration with the indexes the generated datatable endpoints rely on
+
+For every entity in implement_datatables.ENTITIES:
+  - (status, <column>) for each sortable column, since every list filters on status
+  - the foreign key column of each joined association
+  - the search_text column of "folded_search" entities (added and backfilled) with its
+    (status, search_text) or FULLTEXT index
+Indexes already declared by an existing migration (same table, same leading columns) are skipped.
+
+Usage:
+    python generate_datatable_indexes.py
+    python generate_datatable_indexes.py --entity Company --dry-run
+"""
+
+import os
+import re
+import sys
+import glob
+import hashlib
+import argparse
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from implement_datatables import (
+    ENTITIES, SEARCH_TEXT_FIELD, SEARCH_TEXT_LENGTH, query_parts, served_config, split_search_fields
+)
+from staged_writes import StagedWrites
+
+ENTITY_DIR = 'src/Entity/App'
+MIGRATIONS_DIR = 'migrations'
+STATUS_COLUMN = 'status'
+
+# MySQL cannot index these without a prefix length
+UNINDEXABLE_TYPES = {'text', 'json', 'blob', 'simple_array', 'array', 'object'}
+
+TABLE_ATTR_PATTERN = re.compile(r"#\[ORM\\Table\(\s*name:\s*'(\w+)'")
+PROPERTY_PATTERN = re.compile(
+    r'((?:[ \t]*#\[ORM\\[^\n]*\]\s*\n)+)\s*(?:private|protected|public)\s+[?\w\\|]*\s*\$(\w+)'
+)
+COLUMN_NAME_PATTERN = re.compile(r"Column\([^\n]*?\bname:\s*'(\w+)'")
+COLUMN_TYPE_PATTERN = re.compile(r"Column\([^\n]*?\btype:\s*(?:Types::(\w+)|'(\w+)')")
+JOIN_COLUMN_NAME_PATTERN = re.compile(r"JoinColumn\([^\n]*?\bname:\s*'(\w+)'")
+
+# Index declarations found in migrations (SQL inside addSql() or .sql files)
+CREATE_INDEX_PATTERN = re.compile(r'CREATE\s+(?:UNIQUE\s+|FULLTEXT\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*\(([^)]*)\)', re.IGNORECASE)
+CREATE_TABLE_PATTERN = re.compile(r'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?(\w+)`?\s*\((.*)', re.IGNORECASE | re.DOTALL)
+ALTER_TABLE_PATTERN = re.compile(r'ALTER\s+TABLE\s+`?(\w+)`?\s+(.*)', re.IGNORECASE | re.DOTALL)
+INLINE_INDEX_PATTERN = re.compile(r'(?:UNIQUE\s+)?(?:INDEX|KEY)\s+`?(\w+)`?\s*\(([^)]*)\)', re.IGNORECASE)
+DROP_INDEX_PATTERN = re.compile(r'DROP\s+INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?', re.IGNORECASE)
+DROP_TABLE_PATTERN = re.compile(r'DROP\s+TABLE\s+(?:IF\s+EXISTS\s+)?`?(\w+)`?', re.IGNORECASE)
+ADD_SQL_PATTERN = re.compile(r"""addSql\(\s*(?:'((?:[^'\\]|\\.)*)'|"((?:[^"\\]|\\.)*)")""")
+
+
+def parse_entity(entity_name: str) -> Optional[Dict]:
+    """Table name, property -> column and association -> join column of an entity class"""
+    file_path = os.path.join(ENTITY_DIR, f"{entity_name}.php")
+    if not os.path.exists(file_path):
+        return None
+
+    with open(file_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    table = TABLE_ATTR_PATTERN.search(content)
+    entity = {
+        'table': table.group(1) if table else entity_name,
+        'columns': {},
+        'join_columns': {},
+    }
+
+    for match in PROPERTY_PATTERN.finditer(content):
+        attrs, prop = match.group(1), match.group(2)
+        if 'ORM\\ManyToOne' in attrs or 'ORM\\OneToOne' in attrs:
+            name = JOIN_COLUMN_NAME_PATTERN.search(attrs)
+            entity['join_columns'][prop] = name.group(1) if name else f"{prop}_id"
+        elif 'ORM\\Column' in attrs:
+            name = COLUMN_NAME_PATTERN.search(attrs)
+            column_type = COLUMN_TYPE_PATTERN.search(attrs)
+            entity['columns'][prop] = {
+                'name': name.group(1) if name else prop,
+                'type': (column_type.group(1) or column_type.group(2)).lower() if column_type else None,
+            }
+
+    return entity
+
+
+def migration_statements(migrations_dir: str = MIGRATIONS_DIR) -> List[str]:
+    """SQL run by the up() of every migration (addSql() calls) and by the .sql files"""
+    statements = []
+    for path in sorted(glob.glob(os.path.join(migrations_dir, '**', '*.php'), recursive=True)):
+        with open(path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        # Only up() describes the resulting schema
+        up_start = content.find('function up(')
+        down_start = content.find('function down(')
+        if up_start != -1:
+            content = content[up_start:down_start if down_start > up_start else len(content)]
+        for single, double in ADD_SQL_PATTERN.findall(content):
+            statements.append(single.replace("\\'", "'") if single else double)
+    for path in sorted(glob.glob(os.path.join(migrations_dir, '**', '*.sql'), recursive=True)):
+        with open(path, 'r', encoding='utf-8') as f:
+            statements += f.read().split(';')
+    return statements
+
+
+def existing_indexes(statements: List[str]) -> Set[Tuple[str, Tuple[str, ...]]]:
+    """(table, columns) of every index created and not dropped by the migrations, lowercased"""
+    indexes: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+
+    def columns_of(text):
+        return tuple(c.strip().strip('`').split('(')[0].lower() for c in text.split(','))
+
+    for sql in statements:
+        for name, table, columns in CREATE_INDEX_PATTERN.findall(sql):
+            indexes[(table.lower(), name.lower())] = columns_of(columns)
+        for name, table in DROP_INDEX_PATTERN.findall(sql):
+            indexes.pop((table.lower(), name.lower()), None)
+        for table in DROP_TABLE_PATTERN.findall(sql):
+            for key in [key for key in indexes if key[0] == table.lower()]:
+                del indexes[key]
+
+        table_match = CREATE_TABLE_PATTERN.search(sql) or ALTER_TABLE_PATTERN.search(sql)
+        if table_match and not CREATE_INDEX_PATTERN.search(sql):
+            table = table_match.group(1).lower()
+            for name, columns in INLINE_INDEX_PATTERN.findall(table_match.group(2)):
+                indexes[(table, name.lower())] = columns_of(columns)
+            if 'PRIMARY KEY' in sql.upper():
+                primary = re.search(r'PRIMARY\s+KEY\s*\(([^)]*)\)', sql, re.IGNORECASE)
+                if primary:
+                    indexes[(table, 'primary')] = columns_of(primary.group(1))
+
+    return {(table, columns) for (table, _), columns in indexes.items()}
+
+
+def has_added_column(table: str, column: str, statements: List[str]) -> bool:
+    """Whether a migration already adds column to table (ALTER TABLE ... ADD or CREATE TABLE)"""
+    add = re.compile(rf'ALTER\s+TABLE\s+`?{table}`?\s+.*\bADD\s+(?:COLUMN\s+)?`?{column}`?\s', re.IGNORECASE | re.DOTALL)
+    create = re.compile(rf'CREATE\s+TABLE\s+(?:IF\s+NOT\s+EXISTS\s+)?`?{table}`?\s*\(.*[(,]\s*`?{column}`?\s', re.IGNORECASE | re.DOTALL)
+    return any(add.search(sql) or create.search(sql) for sql in statements)
+
+
+def is_covered(table: str, columns: Tuple[str, ...], present: Set[Tuple[str, Tuple[str, ...]]]) -> bool:
+    """An index is redundant if an existing one on the table starts with the same columns"""
+    table, columns = table.lower(), tuple(c.lower() for c in columns)
+    return any(t == table and existing[:len(columns)] == columns for t, existing in present)
+
+
+def index_name(table: str, columns: Tuple[str, ...]) -> str:
+    """idx_<table>_<columns>, shortened with a hash past MySQL's 64 character limit"""
+    name = f"idx_{table}_{'_'.join(columns)}".lower()
+    if len(name) > 64:
+        name = f"{name[:55]}_{hashlib.sha1(name.encode()).hexdigest()[:8]}"
+    return name
+
+
+def wanted_indexes(entity_name: str, config: Dict, entity: Dict) -> List[Tuple[str, Tuple[str, ...], str, str]]:
+    """(table, columns, reason, kind) needed by the generated datatable endpoint of one entity"""
+
+    table = entity['table']
+    status = entity['columns'].get(STATUS_COLUMN)
+    parts = query_parts(config)
+    wanted = []
+
+    # (status, <order column>) for every sortable column of the root entity
+    for path in parts['columns']:
+        alias, field = path.split('.', 1)
+        if alias != 'e' or field == STATUS_COLUMN:
+            continue
+        column = entity['columns'].get(field)
+        if column is None:
+            print(f"⚠️ {entity_name}: '{field}' is not a mapped column, skipped")
+            continue
+        if column['type'] in UNINDEXABLE_TYPES:
+            print(f"⚠️ {entity_name}: '{field}' is a {column['type']} column, skipped")
+            continue
+        if status is None:
+            wanted.append((table, (column['name'],), f"order by {field}", 'INDEX'))
+        else:
+            wanted.append((table, (status['name'], column['name']), f"status filter + order by {field}", 'INDEX'))
+
+    # Foreign key of every joined association
+    for join in parts['joins']:
+        for association in re.findall(r"[jJ]oin\('e\.(\w+)'", join):
+            join_column = entity['join_columns'].get(association)
+            if join_column is None:
+                print(f"⚠️ {entity_name}: '{association}' is not a to-one association, skipped")
+                continue
+            wanted.append((table, (join_column,), f"join {association}", 'INDEX'))
+
+    # Folded search column: prefix LIKE runs on (status, search_text), fulltext on its own index
+    mode = config.get('folded_search')
+    if mode and SEARCH_TEXT_FIELD in entity['columns']:
+        if mode == 'fulltext':
+            wanted.append((table, (SEARCH_TEXT_FIELD,), "folded fulltext search", 'FULLTEXT INDEX'))
+        elif status is not None:
+            wanted.append((table, (status['name'], SEARCH_TEXT_FIELD), "status filter + folded prefix search", 'INDEX'))
+        else:
+            wanted.append((table, (SEARCH_TEXT_FIELD,), "folded prefix search", 'INDEX'))
+
+    return wanted
+
+
+def search_text_column(entity_name: str, config: Dict, entity: Dict, statements: List[str]) -> Optional[Tuple[str, List[str]]]:
+    """(table, source columns) when the folded search column still has to be added"""
+    if not config.get('folded_search'):
+        return None
+    if SEARCH_TEXT_FIELD not in entity['columns']:
+        print(f"⚠️ {entity_name}: no ${SEARCH_TEXT_FIELD} property yet, run implement_datatables.py first")
+        return None
+    if has_added_column(entity['table'], SEARCH_TEXT_FIELD, statements):
+        print(f"♻️ {entity['table']}.{SEARCH_TEXT_FIELD} already added")
+        return None
+
+    own, _ = split_search_fields(config['search_fields'])
+    sources = [entity['columns'][field]['name'] for field in own if field in entity['columns']]
+    return entity['table'], sources
+
+
+def migration_code(version: str, columns: List[Tuple[str, List[str]]],
+                   indexes: List[Tuple[str, Tuple[str, ...], str, str]]) -> str:
+    up = []
+    down = []
+    for table, sources in columns:
+        up.append(f"        // Folded search column, kept up to date by DatatableSearchTextListener")
+        up.append(f"        $this->addSql('ALTER TABLE {table} ADD {SEARCH_TEXT_FIELD} VARCHAR({SEARCH_TEXT_LENGTH}) DEFAULT NULL');")
+        if sources:
+            # Lowercased only; the accent-insensitive collation matches until the listener refolds the row
+            concat = f"CONCAT_WS(\\' \\', {', '.join(sources)})"
+            up.append(f"        $this->addSql('UPDATE {table} SET {SEARCH_TEXT_FIELD} = LEFT(LOWER({concat}), {SEARCH_TEXT_LENGTH})');")
+    for table, index_columns, reason, kind in indexes:
+        name = index_name(table, index_columns)
+        up.append(f"        // {reason}")
+        up.append(f"        $this->addSql('CREATE {kind} {name} ON {table} ({', '.join(index_columns)})');")
+        down.append(f"        $this->addSql('DROP INDEX {name} ON {table}');")
+    for table, _ in columns:
+        down.append(f"        $this->addSql('ALTER TABLE {table} DROP {SEARCH_TEXT_FIELD}');")
+
+    return f"""<?php
+
+declare(strict_types=1);
+
+namespace DoctrineMigrations;
+
+use Doctrine\\DBAL\\Schema\\Schema;
+use Doctrine\\Migrations\\AbstractMigration;
+
+/**
+ * Generated by generate_datatable_indexes.py from implement_datatables.ENTITIES
+ */
+final class Version{version} extends AbstractMigration
+{{
+    public function getDescription(): string
+    {{
+        return 'Indexes for the datatable endpoints';
+    }}
+
+    public function up(Schema $schema): void
+    {{
+{chr(10).join(up)}
+    }}
+
+    public function down(Schema $schema): void
+    {{
+{chr(10).join(down)}
+    }}
+}}
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the index migration for the datatable endpoints')
+    parser.add_argument(
+        '--entity',
+        action='append',
+        help='Only this entity (repeatable, default: every entity in ENTITIES)'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Print the indexes without writing the migration'
+    )
+    args = parser.parse_args()
+
+    entities = {name: config for name, config in ENTITIES.items() if not args.entity or name in args.entity}
+    statements = migration_statements()
+    present = existing_indexes(statements)
+
+    columns = []
+    indexes = []
+    for entity_name, config in entities.items():
+        # A kept hand-written datatable action never reads search_text: no column for it
+        served = served_config(config)
+        if config.get('folded_search') and not served.get('folded_search'):
+            print(f"⏭️ {entity_name}: datatable() is hand-written and never reads {SEARCH_TEXT_FIELD}, column skipped")
+        config = served
+
+        entity = parse_entity(entity_name)
+        if entity is None:
+            print(f"⚠️ {entity_name}: entity not found in {ENTITY_DIR}, skipped")
+            continue
+
+        column = search_text_column(entity_name, config, entity, statements)
+        if column:
+            columns.append(column)
+            print(f"✅ {column[0]}.{SEARCH_TEXT_FIELD} - folded search column")
+
+        for table, index_columns, reason, kind in wanted_indexes(entity_name, config, entity):
+            if is_covered(table, index_columns, present):
+                print(f"♻️ {table} ({', '.join(index_columns)}) already indexed")
+                continue
+            present.add((table.lower(), tuple(c.lower() for c in index_columns)))
+            indexes.append((table, index_columns, reason, kind))
+            print(f"✅ {table} ({', '.join(index_columns)}) - {reason}")
+
+    if not columns and not indexes:
+        print("Nothing to do: every index is already in place")
+        return 0
+
+    version = datetime.now().strftime('%Y%m%d%H%M%S')
+    path = os.path.join(MIGRATIONS_DIR, f"Version{version}.php")
+    if args.dry_run:
+        print(f"🔍 [DRY RUN] Would write {path} ({len(indexes)} indexes)")
+        return 0
+
+    stage = StagedWrites()
+    stage.write(path, migration_code(version, columns, indexes))
+    stage.commit()
+    print(f"💾 Wrote {path} ({len(indexes)} indexes)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
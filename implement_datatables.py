@@ -1,7 +1,46 @@
 import os
 import re
+import textwrap
+
+from project_index import ProjectIndex
+from shared_stylesheet import SHARED_STYLESHEET_ASSET, STYLESHEET_LINK, write_section
+from staged_writes import StagedWrites
+from template_tokenizer import TemplateSpans, apply_edits, class_equals, class_starts_with
 
 # Configuración de entidades
+#
+# Claves opcionales del generador:
+#   "join"        -> joins extra para el QueryBuilder, p. ej. "->leftJoin('e.region', 'r')".
+#                    Opcional: las rutas con punto de "columns"/"search_fields" ("region.name")
+#                    y las cadenas de getters de "data_mapping" generan su leftJoin solas
+#   "cache_total" -> recordsTotal sale de una entrada de caché por tenant, invalidada por
+#                    DatatableTotalCacheListener en postPersist/postUpdate/postRemove
+#   "keyset"      -> paginación por cursor (columna ordenada + id) en lugar de OFFSET;
+#                    OFFSET solo se usa para saltos a páginas no visitadas
+#   "approximate_total" -> True o un umbral (10000 por defecto): recordsTotal sale de la
+#                    estimación del optimizador (EXPLAIN) de las filas con status ACTIVE y
+#                    recordsFiltered solo es exacto bajo el umbral; la estimación es fiable con
+#                    el índice (status, ...) de generate_datatable_indexes.py, sin él se acerca
+#                    al total de filas de la tabla. Con "cache_total" el COUNT exacto bajo el
+#                    umbral sale de la caché
+#   "folded_search" -> "prefix" o "fulltext": busca en una columna search_text sin acentos
+#                    (campos "e." de search_fields) mantenida por DatatableSearchTextListener;
+#                    la columna y su índice los genera generate_datatable_indexes.py
+#   "response_cache" -> True o segundos (30 por defecto): la respuesta JSON se cachea por tenant
+#                    y parámetros en el pool "datatable.cache", etiquetada por entidad (y joins);
+#                    DatatableResponseCacheListener purga las etiquetas al escribir. Con ETag/304
+#   "compact_rows" -> cada fila sale como array posicional en lugar de objeto con claves;
+#                    "data: 'name'" y "row.id" de js_columns pasan a índices solos
+#   "server_render" -> la primera página se renderiza en _table_content.html.twig desde
+#                    datatableFirstPage() y DataTables arranca con deferLoading
+#   "timing"      -> mide con Stopwatch el conteo, la consulta, el mapeo y el JSON; las
+#                    duraciones salen en la cabecera Server-Timing y en una línea de log
+#
+# Cada datatable lleva además una acción "<route_name>_export" (/datatable/export?format=csv|jsonl)
+# con la misma búsqueda y orden, que recorre las filas con toIterable() y las envía en streaming.
+#
+# La consulta solo selecciona "columns" y se hidrata como array: "data_mapping" lee
+# $item['name'], y una columna de un join como "region.name" llega como $item['region_name'].
 ENTITIES = {
     "Region": {
         "controller": "src/Controller/RegionController.php",
@@ -9,6 +48,7 @@ ENTITIES = {
         "route_name": "app_region_datatable",
         "columns": ["id", "name", "status"],
         "search_fields": ["e.name"],
+        "folded_search": "prefix",
         "table_headers": [
             '<th style="width: 120px;">Acciones</th>',
             '<th style="width: 50px;">ID</th>',
@@ -46,9 +86,9 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'name' => $item->getName(),
-                'status' => $item->getStatus() ? $item->getStatus()->value : '',
+                'id' => $item['id'],
+                'name' => $item['name'],
+                'status' => $item['status'] ? $item['status']->value : '',
             ];
         """
     },
@@ -59,6 +99,8 @@ ENTITIES = {
         "columns": ["id", "name", "region.name", "status"],
         "search_fields": ["e.name", "r.name"],
         "join": "->leftJoin('e.region', 'r')",
+        "response_cache": True,
+        "server_render": True,
         "table_headers": [
             '<th style="width: 120px;">Acciones</th>',
             '<th style="width: 50px;">ID</th>',
@@ -98,10 +140,10 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'name' => $item->getName(),
-                'region' => $item->getRegion() ? $item->getRegion()->getName() : '',
-                'status' => $item->getStatus() ? $item->getStatus()->value : '',
+                'id' => $item['id'],
+                'name' => $item['name'],
+                'region' => $item['region_name'] ?? '',
+                'status' => $item['status'] ? $item['status']->value : '',
             ];
         """
     },
@@ -150,10 +192,10 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'name' => $item->getName(),
-                'description' => $item->getDescription(),
-                'status' => $item->getStatus() ? $item->getStatus()->value : '',
+                'id' => $item['id'],
+                'name' => $item['name'],
+                'description' => $item['description'],
+                'status' => $item['status'] ? $item['status']->value : '',
             ];
         """
     },
@@ -204,11 +246,11 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'name' => $item->getName(),
-                'date' => $item->getDate() ? $item->getDate()->format('d/m/Y H:i') : '',
-                'location' => $item->getLocation(),
-                'status' => $item->getStatus() ? $item->getStatus()->value : '',
+                'id' => $item['id'],
+                'name' => $item['name'],
+                'date' => $item['date'] ? $item['date']->format('d/m/Y H:i') : '',
+                'location' => $item['location'],
+                'status' => $item['status'] ? $item['status']->value : '',
             ];
         """
     },
@@ -257,10 +299,10 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'platform' => $item->getPlatform(),
-                'url' => $item->getUrl(),
-                'status' => $item->getStatus() ? $item->getStatus()->value : '',
+                'id' => $item['id'],
+                'platform' => $item['platform'],
+                'url' => $item['url'],
+                'status' => $item['status'] ? $item['status']->value : '',
             ];
         """
     },
@@ -270,6 +312,10 @@ ENTITIES = {
         "route_name": "app_notification_datatable",
         "columns": ["id", "title", "message", "status"],
         "search_fields": ["e.title", "e.message"],
+        "keyset": True,
+        "approximate_total": True,
+        "compact_rows": True,
+        "timing": True,
         "table_headers": [
             '<th style="width: 120px;">Acciones</th>',
             '<th style="width: 50px;">ID</th>',
@@ -309,10 +355,10 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'title' => $item->getTitle(),
-                'message' => substr($item->getMessage() ?? '', 0, 50) . '...',
-                'status' => $item->getStatus() ? $item->getStatus()->value : '',
+                'id' => $item['id'],
+                'title' => $item['title'],
+                'message' => substr($item['message'] ?? '', 0, 50) . '...',
+                'status' => $item['status'] ? $item['status']->value : '',
             ];
         """
     },
@@ -359,44 +405,941 @@ ENTITIES = {
         ],
         "data_mapping": """
             $data[] = [
-                'id' => $item->getId(),
-                'email' => $item->getEmail(),
-                'roles' => implode(', ', $item->getRoles()),
+                'id' => $item['id'],
+                'email' => $item['email'],
+                'roles' => implode(', ', $item['roles'] ?? []),
             ];
         """
     }
 }
 
-def update_controller(entity_name, config):
-    file_path = config['controller']
+TOTAL_CACHE_LISTENER = "src/EventListener/DatatableTotalCacheListener.php"
+SEARCH_TEXT_LISTENER = "src/EventListener/DatatableSearchTextListener.php"
+RESPONSE_CACHE_LISTENER = "src/EventListener/DatatableResponseCacheListener.php"
+MATCH_AGAINST_FUNCTION = "src/Doctrine/MatchAgainst.php"
+ENTITY_DIR = "src/Entity/App"
+
+# Accent-folded copy of the root search fields, see "folded_search"
+SEARCH_TEXT_FIELD = "search_text"
+SEARCH_TEXT_LENGTH = 255
+# InnoDB's default full-text stopword list: never worth a +term* of their own
+FULLTEXT_STOPWORDS = (
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how',
+    'i', 'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what',
+    'when', 'where', 'who', 'will', 'with', 'und', 'www',
+)
+
+def add_use_statements(content, imports):
+    """Add missing `use` imports after the last one of the file"""
+    missing = [fqcn for fqcn in imports if f"use {fqcn};" not in content]
+    if not missing:
+        return content
+    uses = list(re.finditer(r'^use [^;]+;[ \t]*$', content, re.MULTILINE))
+    if not uses:
+        return content
+    insert_pos = uses[-1].end()
+    return content[:insert_pos] + "".join(f"\nuse {fqcn};" for fqcn in missing) + content[insert_pos:]
+
+APPROXIMATE_COUNT_THRESHOLD = 10000
+
+# Tag-aware pool declared in config/packages/cache.yaml, see "response_cache"
+RESPONSE_CACHE_POOL = "datatable.cache"
+RESPONSE_CACHE_TTL = 30
+
+def response_cache_ttl(config):
+    """Lifetime in seconds of a cached datatable response"""
+    value = config.get('response_cache')
+    return value if isinstance(value, int) and not isinstance(value, bool) else RESPONSE_CACHE_TTL
+
+def association_entity(entity_name, association):
+    """Entity class of an association, read from its typed property (region -> Region)"""
+    path = os.path.join(ENTITY_DIR, f"{entity_name}.php")
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            match = re.search(r'\??(\w+)\s+\$' + re.escape(association) + r'\b', f.read())
+        if match and match.group(1) not in ('Collection', 'array'):
+            return match.group(1)
+    return association[:1].upper() + association[1:]
+
+def response_cache_entities(entity_name, parts):
+    """Entities whose writes change a cached response: the listed one and every joined one"""
+    names = [entity_name]
+    for association in parts['associations']:
+        name = association_entity(entity_name, association)
+        if name not in names:
+            names.append(name)
+    return names
+
+def approximate_threshold(config):
+    """Row count above which "approximate_total" stops counting exactly"""
+    value = config.get('approximate_total')
+    return value if isinstance(value, int) and not isinstance(value, bool) else APPROXIMATE_COUNT_THRESHOLD
+
+def total_count_php(entity_name, config):
+    """PHP computing $totalRecords, the unfiltered count of active rows"""
+    count_query = f"""$em->createQueryBuilder()
+            ->select('COUNT(e.id)')
+            ->from('App\Entity\App\{entity_name}', 'e')
+            ->where('e.status = :status')
+            ->setParameter('status', Status::ACTIVE)
+            ->getQuery()
+            ->getSingleScalarResult()"""
+
+    if config.get('cache_total'):
+        # Per-tenant cache entry, invalidated by DatatableTotalCacheListener on writes
+        # ($tenant is already set when the whole response is cached)
+        tenant = "" if config.get('response_cache') else "$tenant = $this->tenantManager->getCurrentTenant() ?? $dominio;\n        "
+        exact_count = f"""$cache->get(
+            DatatableTotalCacheListener::cacheKey($tenant, '{entity_name}'),
+            function (ItemInterface $item) use ($em): int {{
+                $item->expiresAfter(3600);
+
+                return (int) {count_query.replace(chr(10), chr(10) + '        ')};
+            }}
+        )"""
+    else:
+        tenant = ""
+        exact_count = f"(int) {count_query}"
+
+    if config.get('approximate_total'):
+        # Optimizer estimate of the active rows, the same rows the exact COUNT counts
+        # (information_schema TABLE_ROWS would count every status); exact COUNT only for
+        # small tables, cached too when "cache_total" is set
+        threshold = approximate_threshold(config)
+        exact_count = re.sub(r'\n(?=.)', '\n    ', exact_count)
+        return f"""{tenant}$metadata = $em->getClassMetadata('App\Entity\App\{entity_name}');
+        $estimate = $em->getConnection()->fetchAssociative(
+            sprintf('EXPLAIN SELECT 1 FROM %s WHERE %s = ?', $metadata->getTableName(), $metadata->getColumnName('status')),
+            [Status::ACTIVE->value]
+        );
+        $totalRecords = (int) ($estimate['rows'] ?? 0);
+        $totalEstimated = $totalRecords > {threshold};
+        if (!$totalEstimated) {{
+            $totalRecords = {exact_count};
+        }}"""
+
+    return f"{tenant}$totalRecords = {exact_count};"
+
+# Alias prefix of the joins query_parts derives itself
+DERIVED_JOIN_PREFIX = 'j_'
+JOIN_ALIAS_PATTERN = re.compile(r"[jJ]oin\('e\.(\w+)',\s*'(\w+)'")
+# One ->leftJoin('e.x', 'x', ...) / ->innerJoin(...) call of a "join" snippet: (call, method, alias)
+JOIN_CALL_PATTERN = re.compile(r"(->(\w*[jJ]oin)\(\s*'[\w.]+',\s*'(\w+)'(?:[^()]|\([^()]*\))*\))")
+
+# Getter calls a data_mapping may still use; they become keys of the hydrated array
+GUARDED_CHAIN_PATTERN = re.compile(
+    r"\$item->get(\w+)\(\)\s*\?\s*\$item->get\1\(\)->get(\w+)\(\)\s*:\s*('[^']*'|\"[^\"]*\"|null|\d+)"
+)
+GETTER_CHAIN_PATTERN = re.compile(r"\$item->get(\w+)\(\)->get(\w+)\(\)")
+GETTER_PATTERN = re.compile(r"\$item->get(\w+)\(\)")
+ARRAY_KEY_PATTERN = re.compile(r"\$item\['(\w+)'\]")
+
+def lcfirst(name):
+    return name[:1].lower() + name[1:]
+
+def join_aliases(config):
+    """Association -> DQL alias, read from the "join" snippet (e.g. region -> r)"""
+    return dict(JOIN_ALIAS_PATTERN.findall(config.get('join', '')))
+
+def array_mapping(data_mapping):
+    """Rewrite getter calls of a data_mapping to array keys
+
+    Returns the new mapping and the columns it reads, as "field" or "association.field":
+    $item->getRegion() ? $item->getRegion()->getName() : '' -> $item['region_name'] ?? ''
+    """
+    columns = []
+
+    def guarded(match):
+        association, field = lcfirst(match.group(1)), lcfirst(match.group(2))
+        columns.append(f"{association}.{field}")
+        return f"$item['{association}_{field}'] ?? {match.group(3)}"
+
+    def chain(match):
+        association, field = lcfirst(match.group(1)), lcfirst(match.group(2))
+        columns.append(f"{association}.{field}")
+        return f"$item['{association}_{field}']"
+
+    def getter(match):
+        field = lcfirst(match.group(1))
+        columns.append(field)
+        return f"$item['{field}']"
+
+    data_mapping = GUARDED_CHAIN_PATTERN.sub(guarded, data_mapping)
+    data_mapping = GETTER_CHAIN_PATTERN.sub(chain, data_mapping)
+    data_mapping = GETTER_PATTERN.sub(getter, data_mapping)
+    return data_mapping, columns
+
+# One "'key' => value" entry of a data_mapping row, and the row fields the JS columns read
+ROW_KEY_PATTERN = re.compile(r"^([ \t]*)'(\w+)'\s*=>\s*", re.MULTILINE)
+JS_DATA_KEY_PATTERN = re.compile(r"\bdata:\s*'(\w+)'")
+JS_ROW_FIELD_PATTERN = re.compile(r"\brow\.(\w+)\b")
+
+def positional_mapping(data_mapping):
+    """Drop the keys of a data_mapping row so it encodes as a JSON array
+
+    Returns the new mapping and the keys in row order, i.e. the index of each field:
+    'name' => $item['name'] -> $item['name']
+    """
+    keys = [key for _, key in ROW_KEY_PATTERN.findall(data_mapping)]
+    return ROW_KEY_PATTERN.sub(r"\1", data_mapping), keys
+
+def positional_js_columns(entity_name, js_columns, keys):
+    """Point the JS columns at row indexes: data: 'name' -> data: 1, row.id -> row[0]"""
+    indexes = {key: index for index, key in enumerate(keys)}
+
+    def index_of(match, template):
+        key = match.group(1)
+        if key not in indexes:
+            print(f"⚠️ JS column of {entity_name} reads '{key}', which data_mapping does not emit")
+            return match.group(0)
+        return template.format(indexes[key])
+
+    columns = []
+    for column in js_columns:
+        column = JS_DATA_KEY_PATTERN.sub(lambda m: index_of(m, "data: {}"), column)
+        columns.append(JS_ROW_FIELD_PATTERN.sub(lambda m: index_of(m, "row[{}]"), column))
+    return columns
+
+def query_parts(config):
+    """Joins, selects, order columns, search paths and mapping derived from the entity config
+
+    Dotted paths ('region.name' in columns or search_fields, getter chains in data_mapping)
+    get a leftJoin unless "join" already declares the association, so a relation is never
+    lazy-loaded per row and an omitted "join" no longer breaks the query.
+    """
+    aliases = join_aliases(config)
+    joins = [call for call, _, _ in JOIN_CALL_PATTERN.findall(config.get('join', ''))]
+    if config.get('join') and not joins:
+        joins = [config['join']]  # Not a plain join call: used verbatim
+
+    def resolve(association):
+        if association not in aliases:
+            # Prefixed so an association named like a DQL keyword (order, group...) stays valid
+            aliases[association] = f"{DERIVED_JOIN_PREFIX}{association}"
+            joins.append(f"->leftJoin('e.{association}', '{aliases[association]}')")
+        return aliases[association]
+
+    def column_select(column):
+        if '.' in column:
+            association, field = column.split('.', 1)
+            return (f"{resolve(association)}.{field}", f"{association}_{field}")
+        return (f"e.{column}", column)
+
+    order_selects = [column_select(column) for column in config['columns']]
+
+    # Columns read by data_mapping are selected too (e.id always), but never ordered on
+    data_mapping, mapped_columns = array_mapping(config['data_mapping'])
+    row_mapping = data_mapping
+    if config.get('compact_rows'):
+        data_mapping, _ = positional_mapping(data_mapping)
+    selects = []
+    for select in [('e.id', 'id')] + order_selects + [column_select(column) for column in mapped_columns]:
+        if select[1] not in {key for _, key in selects}:
+            selects.append(select)
+
+    search_paths = []
+    for path in config['search_fields']:
+        alias, field = path.split('.', 1)
+        if alias != 'e' and alias not in aliases.values():
+            alias = resolve(alias)
+        search_paths.append(f"{alias}.{field}")
+
+    # The filtered count only needs inner joins (they filter rows) and the joins searched on
+    search_aliases = {path.split('.', 1)[0] for path in search_paths}
+    count_joins = []
+    for join in joins:
+        call = JOIN_CALL_PATTERN.match(join)
+        if call is None or call.group(2).lower() != 'leftjoin' or call.group(3) in search_aliases:
+            count_joins.append(join)
+
+    return {
+        'joins': joins,
+        'count_joins': count_joins,
+        'selects': selects,
+        'columns': [path for path, _ in order_selects],
+        'search_fields': search_paths,
+        'data_mapping': data_mapping,
+        'row_mapping': row_mapping,
+        'associations': list(aliases),
+    }
+
+def select_php(selects):
+    """Partial select of just the needed columns, hydrated as arrays"""
+    return "->select(" + ", ".join(f"'{path} AS {key}'" for path, key in selects) + ")"
+
+def split_search_fields(search_fields):
+    """Root entity fields (folded into search_text) and joined paths (kept on LIKE)"""
+    own = [path.split('.', 1)[1] for path in search_fields if path.startswith('e.')]
+    joined = [path for path in search_fields if not path.startswith('e.')]
+    return own, joined
+
+def search_php(config, parts):
+    """PHP filtering $qb by $searchValue"""
+    mode = config.get('folded_search')
+    if not mode:
+        search_logic = ",\n                    ".join(
+            f"$qb->expr()->like('{field}', ':search')" for field in parts['search_fields']
+        )
+        return f"""if (!empty($searchValue)) {{
+            $qb->andWhere(
+                $qb->expr()->orX(
+                    {search_logic}
+                )
+            )->setParameter('search', '%' . $searchValue . '%');
+        }}"""
+
+    _, joined = split_search_fields(parts['search_fields'])
+    if mode == 'fulltext':
+        # Every typed word must start a word of search_text (InnoDB boolean mode)
+        stopwords = ', '.join(f"'{word}'" for word in FULLTEXT_STOPWORDS)
+        conditions = [f"'MATCH_AGAINST(e.{SEARCH_TEXT_FIELD}, :search) > 0'"]
+        prepare = f"""$em->getConfiguration()->addCustomStringFunction('MATCH_AGAINST', MatchAgainst::class);
+            $terms = array_diff(
+                array_filter(explode(' ', preg_replace('/[^a-z0-9 ]+/', ' ', $foldedSearch))),
+                [{stopwords}]
+            );
+            $searchParameter = implode(' ', array_map(fn (string $term): string => '+' . $term . '*', $terms));"""
+    else:
+        # search_text starts with the typed text: a range scan on (status, search_text)
+        conditions = [f"$qb->expr()->like('e.{SEARCH_TEXT_FIELD}', ':search')"]
+        prepare = """$searchParameter = addcslashes($foldedSearch, '%_\\\\') . '%';"""
+    conditions += [f"$qb->expr()->like('{field}', ':searchJoined')" for field in joined]
+    search_logic = ",\n                    ".join(conditions)
+    joined_parameter = "\n            $qb->setParameter('searchJoined', '%' . $searchValue . '%');" if joined else ""
+
+    if mode == 'fulltext':
+        # Only punctuation or stopwords typed: no terms, and MATCH ... AGAINST ('') would drop every row
+        filter_php = f"""$qb->andWhere(
+                $qb->expr()->orX(
+                    {search_logic}
+                )
+            )->setParameter('search', $searchParameter);{joined_parameter}"""
+        filter_php = filter_php.replace('\n', '\n    ')
+        return f"""$foldedSearch = DatatableSearchTextListener::fold($searchValue);
+        if ($foldedSearch !== '') {{
+            {prepare}
+            if ($terms !== []) {{
+                {filter_php}
+            }}
+        }}"""
+
+    return f"""$foldedSearch = DatatableSearchTextListener::fold($searchValue);
+        if ($foldedSearch !== '') {{
+            {prepare}
+            $qb->andWhere(
+                $qb->expr()->orX(
+                    {search_logic}
+                )
+            )->setParameter('search', $searchParameter);{joined_parameter}
+        }}"""
+
+def filtered_count_php(config, parts):
+    """PHP computing $totalFiltered: reuses $totalRecords unless a search term narrows it"""
+    count_builder = "(clone $qb)\n                ->select('COUNT(e.id)')"
+    if parts['count_joins'] != parts['joins']:
+        count_builder += "\n                ->resetDQLPart('join')"
+        count_builder += "".join(f"\n                {join}" for join in parts['count_joins'])
+    count_builder += "\n                ->resetDQLPart('orderBy')"
+
+    if config.get('approximate_total'):
+        # Fetch at most threshold + 1 ids instead of counting every match
+        threshold = approximate_threshold(config)
+        count_builder = count_builder.replace("->select('COUNT(e.id)')", "->select('e.id')")
+        return f"""if (empty($searchValue)) {{
+            // Nothing typed: the filtered count is the total, no second COUNT
+            $totalFiltered = $totalRecords;
+            $filteredCount = $totalEstimated ? 'estimated' : 'exact';
+        }} else {{
+            // Exact below the threshold, capped above it
+            $countQb = {count_builder}
+                ->setMaxResults({threshold + 1});
+            $totalFiltered = count($countQb->getQuery()->getScalarResult());
+            $filteredCount = $totalFiltered > {threshold} ? 'capped' : 'exact';
+            $totalFiltered = min($totalFiltered, {threshold});
+        }}"""
+
+    return f"""if (empty($searchValue)) {{
+            // Nothing typed: the filtered count is the total, no second COUNT
+            $totalFiltered = $totalRecords;
+        }} else {{
+            // Same filters, without ORDER BY and without joins only the listing needs
+            $countQb = {count_builder};
+            $totalFiltered = (int) $countQb->getQuery()->getSingleScalarResult();
+        }}"""
+
+def pagination_php(config):
+    """PHP ordering the query and fetching the requested page into $results (plain arrays)"""
+    if not config.get('keyset'):
+        return """$qb->orderBy($orderBy, $orderDir);
+
+        $qb->setFirstResult($start)->setMaxResults($length);
+
+        $results = $qb->getQuery()->getArrayResult();"""
+
+    # Seek past the last row of the previous page (ordered column + id) instead of OFFSET
+    return """// Keyset pagination: e.id breaks ties so the cursor is unique
+        $orderDir = strtolower($orderDir) === 'desc' ? 'DESC' : 'ASC';
+        $qb->orderBy($orderBy, $orderDir)
+            ->addOrderBy('e.id', $orderDir)
+            ->addSelect($orderBy . ' AS keysetValue')
+            ->setMaxResults($length);
+
+        $after = $request->query->all('after');
+        if (isset($after['id'], $after['value']) && $after['value'] !== '') {
+            $seek = $orderDir === 'DESC' ? '<' : '>';
+            $seekCondition = $qb->expr()->orX(
+                $orderBy . ' ' . $seek . ' :keysetValue',
+                $qb->expr()->andX($orderBy . ' = :keysetValue', 'e.id ' . $seek . ' :keysetId')
+            );
+            if ($orderDir === 'DESC') {
+                // NULLs sort after every value in descending order
+                $seekCondition->add($qb->expr()->isNull($orderBy));
+            }
+            $qb->andWhere($seekCondition)
+                ->setParameter('keysetValue', $after['value'])
+                ->setParameter('keysetId', (int) $after['id']);
+        } else {
+            // First page or arbitrary page jump: plain OFFSET
+            $qb->setFirstResult($start);
+        }
+
+        $results = $qb->getQuery()->getArrayResult();
+
+        // Cursor for the page that starts right after this one
+        $cursor = null;
+        if ($results) {
+            $lastRow = end($results);
+            $value = $lastRow['keysetValue'];
+            if ($value instanceof \\DateTimeInterface) {
+                $value = $value->format('Y-m-d H:i:s');
+            } elseif ($value instanceof \\BackedEnum) {
+                $value = $value->value;
+            }
+            $cursor = [
+                'start' => $start + count($results),
+                'value' => $value,
+                'id' => $lastRow['id'],
+            ];
+        }"""
+
+def approximate_info_js(config):
+    """DataTables infoCallback phrasing estimated/capped counts as "unos N" / "más de N" """
+    if not config.get('approximate_total'):
+        return ""
+
+    return """
+                infoCallback: function(settings, start, end, max, total, pre) {
+                    // recordsTotal may be a statistics estimate and recordsFiltered capped
+                    const json = settings.json || {};
+                    if (!total) {
+                        return pre;
+                    }
+                    const about = { estimated: 'unos ', capped: 'más de ' }[json.filteredCount] || '';
+                    let info = `Mostrando ${start} a ${end} de ${about}${total.toLocaleString('es')} registros`;
+                    if (total !== max) {
+                        info += ` (filtrado de ${json.totalEstimated ? 'unos ' : ''}${max.toLocaleString('es')} registros totales)`;
+                    }
+                    return info;
+                },"""
+
+def defer_loading_js(cells):
+    """deferLoading with the totals of the server-rendered first page, if there is one"""
+    if cells is None:
+        return ""
+    return """{% if datatable_first_page is defined %}
+                // The first page is already in the HTML (_table_content.html.twig)
+                deferLoading: [{{ datatable_first_page.recordsFiltered }}, {{ datatable_first_page.recordsTotal }}],{% endif %}"""
+
+def ajax_options_js(config):
+    """Extra DataTables ajax options: keyset cursors and response cache revalidation"""
+    options = []
+    data_lines = []
+    if config.get('response_cache'):
+        # DataTables sends cache: false (a "_" timestamp) and a draw counter, so no two
+        # requests share a URL; without both the browser revalidates repeated draws
+        # with If-None-Match and gets a bodiless 304 back
+        options.append("cache: true")
+        data_lines.append("""                        // The response omits draw too, see the datatable endpoint
+                        delete d.draw;""")
+
+    # Cursors are remembered per page start, so next/previous pages seek and only
+    # pages never visited (a jump to "Último", a typed page) fall back to OFFSET
+    if config.get('keyset'):
+        data_lines.append("""                        // A cursor is only valid for the same order, search and page length
+                        const state = JSON.stringify([d.order, d.search.value, d.length]);
+                        if (state !== keysetState) {
+                            keysetState = state;
+                            keysetCursors = {};
+                        }
+                        if (keysetCursors[d.start]) {
+                            d.after = keysetCursors[d.start];
+                        }""")
+
+    if data_lines:
+        options.append("data: function(d) {\n" + "\n".join(data_lines) + "\n                    }")
+    if config.get('keyset'):
+        options.append("""dataSrc: function(json) {
+                        if (json.cursor) {
+                            keysetCursors[json.cursor.start] = { value: json.cursor.value ?? '', id: json.cursor.id };
+                        }
+                        return json.data;
+                    }""")
+
+    return "".join(",\n                    " + option for option in options)
+
+def generate_total_cache_listener(entities, stage):
+    """Write the Doctrine listener that drops cached datatable totals on writes"""
+    cached = [name for name, config in entities.items() if config.get('cache_total')]
+    if not cached:
+        return
+
+    entity_map = "\n".join(f"        \\App\\Entity\\App\\{name}::class => '{name}'," for name in cached)
+    listener_code = f"""<?php
+
+namespace App\EventListener;
+
+use App\Service\TenantManager;
+use Doctrine\Bundle\DoctrineBundle\Attribute\AsDoctrineListener;
+use Doctrine\ORM\Event\PostPersistEventArgs;
+use Doctrine\ORM\Event\PostRemoveEventArgs;
+use Doctrine\ORM\Event\PostUpdateEventArgs;
+use Doctrine\ORM\Events;
+use Symfony\Contracts\Cache\CacheInterface;
+
+/**
+ * Invalida el total cacheado (recordsTotal) de los endpoints datatable
+ * cuando una entidad listada se crea, modifica o elimina en el tenant actual.
+ *
+ * Generado por implement_datatables.py a partir de las entidades con "cache_total".
+ */
+#[AsDoctrineListener(event: Events::postPersist)]
+#[AsDoctrineListener(event: Events::postUpdate)]
+#[AsDoctrineListener(event: Events::postRemove)]
+class DatatableTotalCacheListener
+{{
+    private const ENTITIES = [
+{entity_map}
+    ];
+
+    private CacheInterface $cache;
+    private TenantManager $tenantManager;
+
+    public function __construct(CacheInterface $cache, TenantManager $tenantManager)
+    {{
+        $this->cache = $cache;
+        $this->tenantManager = $tenantManager;
+    }}
+
+    public static function cacheKey(string $tenant, string $entity): string
+    {{
+        return sprintf('datatable.total.%s.%s', $tenant, $entity);
+    }}
+
+    public function postPersist(PostPersistEventArgs $args): void
+    {{
+        $this->invalidate($args->getObject());
+    }}
+
+    public function postUpdate(PostUpdateEventArgs $args): void
+    {{
+        $this->invalidate($args->getObject());
+    }}
+
+    public function postRemove(PostRemoveEventArgs $args): void
+    {{
+        $this->invalidate($args->getObject());
+    }}
+
+    private function invalidate(object $entity): void
+    {{
+        foreach (self::ENTITIES as $class => $name) {{
+            // instanceof also matches Doctrine proxies
+            if ($entity instanceof $class) {{
+                $tenant = $this->tenantManager->getCurrentTenant();
+                if ($tenant !== null) {{
+                    $this->cache->delete(self::cacheKey($tenant, $name));
+                }}
+
+                return;
+            }}
+        }}
+    }}
+}}
+"""
+    stage.write(TOTAL_CACHE_LISTENER, listener_code)
+    print(f"✅ Generated {TOTAL_CACHE_LISTENER} ({', '.join(cached)})")
+
+def generate_response_cache_listener(entities, stage):
+    """Write the Doctrine listener that purges the cached datatable responses on writes"""
+    tagged = []
+    for name, config in entities.items():
+        if config.get('response_cache'):
+            for tagged_name in response_cache_entities(name, query_parts(config)):
+                if tagged_name not in tagged:
+                    tagged.append(tagged_name)
+    if not tagged:
+        return
+
+    entity_map = "\n".join(f"        \\App\\Entity\\App\\{name}::class => '{name}'," for name in tagged)
+    listener_code = f"""<?php
+
+namespace App\EventListener;
+
+use App\Service\TenantManager;
+use Doctrine\Bundle\DoctrineBundle\Attribute\AsDoctrineListener;
+use Doctrine\ORM\Event\PostPersistEventArgs;
+use Doctrine\ORM\Event\PostRemoveEventArgs;
+use Doctrine\ORM\Event\PostUpdateEventArgs;
+use Doctrine\ORM\Events;
+use Symfony\Component\DependencyInjection\Attribute\Autowire;
+use Symfony\Contracts\Cache\TagAwareCacheInterface;
+
+/**
+ * Purga las respuestas JSON cacheadas de los endpoints datatable cuando una
+ * entidad listada (o unida a un listado) se crea, modifica o elimina en el tenant actual.
+ *
+ * Cada respuesta lleva una etiqueta por entidad y tenant; las etiquetas tocadas
+ * durante un flush se invalidan juntas en postFlush.
+ *
+ * Generado por implement_datatables.py a partir de las entidades con "response_cache".
+ */
+#[AsDoctrineListener(event: Events::postPersist)]
+#[AsDoctrineListener(event: Events::postUpdate)]
+#[AsDoctrineListener(event: Events::postRemove)]
+#[AsDoctrineListener(event: Events::postFlush)]
+class DatatableResponseCacheListener
+{{
+    private const ENTITIES = [
+{entity_map}
+    ];
+
+    private TagAwareCacheInterface $cache;
+    private TenantManager $tenantManager;
+    /** @var array<string, true> */
+    private array $pendingTags = [];
+
+    public function __construct(
+        #[Autowire(service: '{RESPONSE_CACHE_POOL}')] TagAwareCacheInterface $cache,
+        TenantManager $tenantManager
+    ) {{
+        $this->cache = $cache;
+        $this->tenantManager = $tenantManager;
+    }}
+
+    public static function tag(string $tenant, string $entity): string
+    {{
+        return sprintf('datatable.%s.%s', $tenant, $entity);
+    }}
+
+    public function postPersist(PostPersistEventArgs $args): void
+    {{
+        $this->collect($args->getObject());
+    }}
+
+    public function postUpdate(PostUpdateEventArgs $args): void
+    {{
+        $this->collect($args->getObject());
+    }}
+
+    public function postRemove(PostRemoveEventArgs $args): void
+    {{
+        $this->collect($args->getObject());
+    }}
+
+    public function postFlush(): void
+    {{
+        if ($this->pendingTags === []) {{
+            return;
+        }}
+
+        $tags = array_keys($this->pendingTags);
+        $this->pendingTags = [];
+        $this->cache->invalidateTags($tags);
+    }}
+
+    private function collect(object $entity): void
+    {{
+        foreach (self::ENTITIES as $class => $name) {{
+            // instanceof also matches Doctrine proxies
+            if ($entity instanceof $class) {{
+                $tenant = $this->tenantManager->getCurrentTenant();
+                if ($tenant !== null) {{
+                    $this->pendingTags[self::tag($tenant, $name)] = true;
+                }}
+
+                return;
+            }}
+        }}
+    }}
+}}
+"""
+    stage.write(RESPONSE_CACHE_LISTENER, listener_code)
+    print(f"✅ Generated {RESPONSE_CACHE_LISTENER} ({', '.join(tagged)})")
+
+def getter_name(field):
+    """Doctrine getter of a field: created_at -> getCreatedAt"""
+    return "get" + "".join(part[:1].upper() + part[1:] for part in field.split('_'))
+
+def add_search_text_property(entity_name, stage):
+    """Add the search_text column, getter and setter to the entity class"""
+    file_path = os.path.join(ENTITY_DIR, f"{entity_name}.php")
     if not os.path.exists(file_path):
-        print(f"❌ Controller not found: {file_path}")
+        print(f"❌ Entity not found: {file_path}")
         return
 
-    with open(file_path, 'r') as f:
-        content = f.read()
+    content = stage.read(file_path)
+    if f"${SEARCH_TEXT_FIELD}" in content:
+        return
 
-    if config['route_name'] in content:
-        print(f"⚠️ Datatable endpoint already exists in {entity_name}")
+    property_code = f"""    /**
+     * Accent-folded search text, maintained by DatatableSearchTextListener
+     */
+    #[ORM\\Column(length: {SEARCH_TEXT_LENGTH}, nullable: true)]
+    private ?string ${SEARCH_TEXT_FIELD} = null;
+
+"""
+    accessors = f"""
+    public function getSearchText(): ?string
+    {{
+        return $this->{SEARCH_TEXT_FIELD};
+    }}
+
+    public function setSearchText(?string ${SEARCH_TEXT_FIELD}): self
+    {{
+        $this->{SEARCH_TEXT_FIELD} = ${SEARCH_TEXT_FIELD};
+
+        return $this;
+    }}
+"""
+    # Property goes right before the first method, accessors before the closing brace
+    first_method = re.search(r'^    public function ', content, re.MULTILINE)
+    last_brace_pos = content.rfind('}')
+    if not first_method:
+        print(f"⚠️ Could not find where to add {SEARCH_TEXT_FIELD} in {file_path}, check manually.")
         return
 
-    # Add JsonResponse import if missing
-    if "use Symfony\Component\HttpFoundation\JsonResponse;" not in content:
-        content = content.replace("use Symfony\Component\HttpFoundation\Response;", 
-                                "use Symfony\Component\HttpFoundation\Response;\nuse Symfony\Component\HttpFoundation\JsonResponse;")
+    content = (content[:first_method.start()] + property_code + content[first_method.start():last_brace_pos]
+               + accessors + content[last_brace_pos:])
+    stage.write(file_path, content)
+    print(f"✅ Added {SEARCH_TEXT_FIELD} to {entity_name}")
 
-    # Construct datatable method
-    search_conditions = []
-    for field in config['search_fields']:
-        search_conditions.append(f"$qb->expr()->like('{field}', ':search')")
-    
-    search_logic = ",\n                    ".join(search_conditions)
-    
-    join_logic = config.get('join', '')
-    
-    method_code = f"""
-    #[Route('/datatable', name: '{config['route_name']}', methods: ['GET'])]
-    public function datatable(string $dominio, Request $request): JsonResponse
+def generate_search_text_listener(entities, stage):
+    """Write the Doctrine listener that keeps search_text folded on every insert/update"""
+    folded = {name: config for name, config in entities.items() if config.get('folded_search')}
+    if not folded:
+        return
+
+    fields = []
+    for name, config in folded.items():
+        own, _ = split_search_fields(config['search_fields'])
+        getters = ", ".join(f"'{getter_name(field)}'" for field in own)
+        fields.append(f"        \\App\\Entity\\App\\{name}::class => [{getters}],")
+
+    listener_code = f"""<?php
+
+namespace App\EventListener;
+
+use Doctrine\Bundle\DoctrineBundle\Attribute\AsDoctrineListener;
+use Doctrine\ORM\Event\OnFlushEventArgs;
+use Doctrine\ORM\Events;
+use function Symfony\Component\String\\u;
+
+/**
+ * Mantiene la columna {SEARCH_TEXT_FIELD} (texto de búsqueda sin acentos y en minúsculas)
+ * de las entidades listadas antes de cada flush.
+ *
+ * Generado por implement_datatables.py a partir de las entidades con "folded_search".
+ */
+#[AsDoctrineListener(event: Events::onFlush)]
+class DatatableSearchTextListener
+{{
+    private const FIELDS = [
+{chr(10).join(fields)}
+    ];
+
+    /**
+     * Same folding for the stored text and the typed search: 'Región  Norte' -> 'region norte'
+     */
+    public static function fold(?string $value): string
+    {{
+        return u($value ?? '')->ascii()->lower()->collapseWhitespace()->trim()->toString();
+    }}
+
+    public function onFlush(OnFlushEventArgs $args): void
+    {{
+        $em = $args->getObjectManager();
+        $uow = $em->getUnitOfWork();
+
+        foreach ([...$uow->getScheduledEntityInsertions(), ...$uow->getScheduledEntityUpdates()] as $entity) {{
+            foreach (self::FIELDS as $class => $getters) {{
+                if (!$entity instanceof $class) {{
+                    continue;
+                }}
+
+                $values = [];
+                foreach ($getters as $getter) {{
+                    $values[] = (string) $entity->$getter();
+                }}
+                $searchText = mb_substr(self::fold(implode(' ', $values)), 0, {SEARCH_TEXT_LENGTH});
+
+                if ($entity->getSearchText() !== $searchText) {{
+                    $entity->setSearchText($searchText);
+                    $uow->recomputeSingleEntityChangeSet($em->getClassMetadata($entity::class), $entity);
+                }}
+                break;
+            }}
+        }}
+    }}
+}}
+"""
+    stage.write(SEARCH_TEXT_LISTENER, listener_code)
+    print(f"✅ Generated {SEARCH_TEXT_LISTENER} ({', '.join(folded)})")
+
+    if any(config['folded_search'] == 'fulltext' for config in folded.values()):
+        stage.write(MATCH_AGAINST_FUNCTION, MATCH_AGAINST_CODE)
+        print(f"✅ Generated {MATCH_AGAINST_FUNCTION}")
+
+MATCH_AGAINST_CODE = """<?php
+
+namespace App\\Doctrine;
+
+use Doctrine\\ORM\\Query\\AST\\Functions\\FunctionNode;
+use Doctrine\\ORM\\Query\\AST\\Node;
+use Doctrine\\ORM\\Query\\AST\\PathExpression;
+use Doctrine\\ORM\\Query\\Parser;
+use Doctrine\\ORM\\Query\\SqlWalker;
+use Doctrine\\ORM\\Query\\TokenType;
+
+/**
+ * MATCH_AGAINST(e.field, :query) -> MATCH (field) AGAINST (:query IN BOOLEAN MODE)
+ *
+ * Generado por implement_datatables.py para las entidades con "folded_search": "fulltext".
+ */
+class MatchAgainst extends FunctionNode
+{
+    private PathExpression $field;
+    private Node $query;
+
+    public function parse(Parser $parser): void
+    {
+        $parser->match(TokenType::T_IDENTIFIER);
+        $parser->match(TokenType::T_OPEN_PARENTHESIS);
+        $this->field = $parser->StateFieldPathExpression();
+        $parser->match(TokenType::T_COMMA);
+        $this->query = $parser->InputParameter();
+        $parser->match(TokenType::T_CLOSE_PARENTHESIS);
+    }
+
+    public function getSql(SqlWalker $sqlWalker): string
+    {
+        return sprintf(
+            'MATCH (%s) AGAINST (%s IN BOOLEAN MODE)',
+            $this->field->dispatch($sqlWalker),
+            $this->query->dispatch($sqlWalker)
+        );
+    }
+}
+"""
+
+def timed_php(entity_name, config, phase, code):
+    """Wrap code in a Stopwatch event and record its duration in $timings ("timing" mode only)"""
+    if not config.get('timing'):
+        return code
+    event = f"datatable.{entity_name}.{phase}"
+    return f"""$stopwatch->start('{event}', 'datatable');
+        {code}
+        $timings['{phase}'] = $stopwatch->stop('{event}')->getDuration();"""
+
+def timing_report_php(entity_name, config):
+    """PHP sending $timings as a Server-Timing header and one structured log line"""
+    if not config.get('timing'):
+        return ""
+    return f"""// Per-phase durations (ms) for the browser devtools and the log pipeline
+        $response->headers->set('Server-Timing', implode(', ', array_map(
+            fn (string $phase, float $duration): string => sprintf('%s;dur=%.1F', $phase, $duration),
+            array_keys($timings),
+            $timings
+        )));
+        $logger->info('datatable timing', [
+            'entity' => '{entity_name}',
+            'tenant' => $this->tenantManager->getCurrentTenant() ?? $dominio,
+            'timings' => $timings,
+        ]);
+
+        """
+
+def response_cache_php(entity_name, config, parts, query_code, payload):
+    """PHP answering from the tenant's cached payload, or computing and tagging it, with an ETag
+
+    The key hashes the parameters that shape the result (never draw), the tags name the
+    listed entity and every joined one so DatatableResponseCacheListener purges them on writes.
+    """
+    key_params = "$start, $length, $searchValue, $orderBy, strtolower((string) $orderDir)"
+    if config.get('keyset'):
+        key_params += ", $request->query->all('after')"
+    tags = ", ".join(
+        f"DatatableResponseCacheListener::tag($tenant, '{name}')"
+        for name in response_cache_entities(entity_name, parts)
+    )
+    indented_query = "\n".join(("    " + line) if line.strip() else line for line in query_code.split("\n"))
+
+    return f"""// Identical requests of a tenant share one payload for {response_cache_ttl(config)}s; writes purge its tags
+        $tenant = $this->tenantManager->getCurrentTenant() ?? $dominio;
+        $cacheItem = $datatableCache->getItem(sprintf(
+            'datatable.response.%s.{entity_name}.%s',
+            $tenant,
+            sha1(json_encode([{key_params}]))
+        ));
+
+        if ($cacheItem->isHit()) {{
+            $payload = $cacheItem->get();
+        }} else {{
+        {indented_query}
+
+            $payload = [
+                {payload.replace(chr(10), chr(10) + '    ')}
+            ];
+            $cacheItem->set($payload)
+                ->expiresAfter({response_cache_ttl(config)})
+                ->tag([{tags}]);
+            $datatableCache->save($cacheItem);
+        }}
+
+        // The client leaves draw out so repeated requests share a URL (see the ajax options)
+        if ($request->query->has('draw')) {{
+            $payload = ['draw' => $draw] + $payload;
+        }}
+
+        // Unchanged payloads are revalidated by the browser and answered with a bodiless 304
+        {timed_php(entity_name, config, 'encode', '$response = new JsonResponse($payload);')}
+        $response->setEtag(sha1($response->getContent()));
+        $response->setPrivate();
+        $response->headers->addCacheControlDirective('no-cache');
+        $response->isNotModified($request);
+
+        {timing_report_php(entity_name, config)}return $response;"""
+
+# Rows streamed between two EntityManager clears / output flushes of an export
+EXPORT_BATCH_SIZE = 500
+
+def export_route_name(config):
+    return f"{config['route_name']}_export"
+
+def export_php(entity_name, config, parts):
+    """Action streaming the whole filtered, ordered list as CSV or JSONL
+
+    Same search and order as the datatable action, but the rows are iterated with
+    toIterable() from an unbuffered query, so memory stays flat whatever the table size.
+    """
+    join_logic = "\n            ".join(parts['joins'])
+    # Keyed rows even with "compact_rows": the keys are the CSV header
+    row_mapping = parts['row_mapping'].replace('$data[] =', '$row =', 1)
+    row_mapping = "\n".join(("        " + line) if line.strip() else line for line in row_mapping.split("\n"))
+    file_name = re.sub(r'(?<!^)(?=[A-Z])', '-', entity_name).lower()
+
+    return f"""
+    #[Route('/datatable/export', name: '{export_route_name(config)}', methods: ['GET'])]
+    public function datatableExport(string $dominio, Request $request): StreamedResponse
     {{
         if (empty($dominio)) {{
             throw $this->createNotFoundException('Dominio no especificado en la ruta.');
@@ -404,117 +1347,713 @@ def update_controller(entity_name, config):
 
         $em = $this->tenantManager->getEntityManager();
 
-        // DataTables parameters
-        $draw = (int) $request->query->get('draw', 1);
-        $start = (int) $request->query->get('start', 0);
-        $length = (int) $request->query->get('length', 25);
-        
+        $format = $request->query->get('format') === 'jsonl' ? 'jsonl' : 'csv';
+
+        // Same search and order parameters as the datatable action
         $search = $request->query->all('search');
         $searchValue = isset($search['value']) ? $search['value'] : '';
-        
+
         $order = $request->query->all('order');
         $orderColumn = isset($order[0]['column']) ? (int) $order[0]['column'] : 0;
-        $orderDir = isset($order[0]['dir']) ? $order[0]['dir'] : 'asc';
+        $orderDir = isset($order[0]['dir']) && strtolower($order[0]['dir']) === 'desc' ? 'DESC' : 'ASC';
 
-        $columns = {str(config['columns'])};
-        $orderBy = isset($columns[$orderColumn]) ? $columns[$orderColumn] : 'id';
+        $columns = {str(parts['columns'])};
+        $orderBy = isset($columns[$orderColumn]) ? $columns[$orderColumn] : 'e.id';
 
         $qb = $em->createQueryBuilder()
-            ->select('e')
+            {select_php(parts['selects'])}
             ->from('App\Entity\App\{entity_name}', 'e')
             {join_logic}
             ->where('e.status = :status')
             ->setParameter('status', Status::ACTIVE);
 
-        if (!empty($searchValue)) {{
-            $qb->andWhere(
-                $qb->expr()->orX(
-                    {search_logic}
-                )
-            )->setParameter('search', '%' . $searchValue . '%');
-        }}
+        {search_php(config, parts)}
 
-        $countQb = clone $qb;
-        $totalFiltered = (int) $countQb->select('COUNT(e.id)')->getQuery()->getSingleScalarResult();
+        $qb->orderBy($orderBy, $orderDir)
+            ->addOrderBy('e.id', 'ASC');
 
-        // Fix ordering for joined fields
-        if (strpos($orderBy, '.') !== false) {{
-            [$alias, $field] = explode('.', $orderBy);
-            $qb->orderBy($alias . '.' . $field, $orderDir);
-        }} else {{
-            $qb->orderBy('e.' . $orderBy, $orderDir);
-        }}
+        $response = new StreamedResponse(function () use ($em, $qb, $format): void {{
+            set_time_limit(0);
 
-        $qb->setFirstResult($start)->setMaxResults($length);
+            // Unbuffered: rows come from MySQL as they are iterated instead of all at once
+            $pdo = $em->getConnection()->getNativeConnection();
+            $unbuffered = $pdo instanceof \\PDO;
+            if ($unbuffered) {{
+                $pdo->setAttribute(\\PDO::MYSQL_ATTR_USE_BUFFERED_QUERY, false);
+            }}
 
-        $results = $qb->getQuery()->getResult();
+            $output = fopen('php://output', 'w');
+            if ($format === 'csv') {{
+                // BOM so spreadsheet apps read the file as UTF-8
+                fwrite($output, "\\xEF\\xBB\\xBF");
+            }}
 
-        $totalRecords = (int) $em->createQueryBuilder()
-            ->select('COUNT(e.id)')
+            try {{
+                $rows = 0;
+                foreach ($qb->getQuery()->toIterable([], AbstractQuery::HYDRATE_ARRAY) as $item) {{
+                    {row_mapping.strip()}
+
+                    if ($format === 'jsonl') {{
+                        fwrite($output, json_encode($row, JSON_UNESCAPED_UNICODE | JSON_UNESCAPED_SLASHES) . "\\n");
+                    }} else {{
+                        if ($rows === 0) {{
+                            fputcsv($output, array_keys($row));
+                        }}
+                        fputcsv($output, $row);
+                    }}
+
+                    if (++$rows % {EXPORT_BATCH_SIZE} === 0) {{
+                        $em->clear();
+                        flush();
+                    }}
+                }}
+            }} finally {{
+                fclose($output);
+                if ($unbuffered) {{
+                    $pdo->setAttribute(\\PDO::MYSQL_ATTR_USE_BUFFERED_QUERY, true);
+                }}
+            }}
+        }});
+
+        $response->headers->set('Content-Type', $format === 'jsonl' ? 'application/x-ndjson' : 'text/csv; charset=UTF-8');
+        $response->headers->set('Content-Disposition', HeaderUtils::makeDisposition(
+            HeaderUtils::DISPOSITION_ATTACHMENT,
+            sprintf('{file_name}-%s.%s', date('Ymd-His'), $format)
+        ));
+        // Let nginx pass the rows on as they are written
+        $response->headers->set('X-Accel-Buffering', 'no');
+
+        return $response;
+    }}
+    """
+
+# Page the server renders for "server_render", as the JS init asks for it
+FIRST_PAGE_LENGTH = 25
+FIRST_PAGE_ORDER = (1, 'DESC')
+
+def first_page_php(entity_name, config, parts):
+    """Private action helper computing the first datatable page for index.html.twig
+
+    Same query the AJAX endpoint runs for the initial order (column 1, DESC) and no
+    search, with keyed rows so _table_content.html.twig reads row.name.
+    """
+    join_logic = "\n            ".join(parts['joins'])
+    column, direction = FIRST_PAGE_ORDER
+    order_by = parts['columns'][column] if len(parts['columns']) > column else 'e.id'
+    tie_break = f"\n            ->addOrderBy('e.id', '{direction}')" if config.get('keyset') else ""
+    # The cached total needs the cache service, the first page counts directly
+    total_count = total_count_php(entity_name, {**config, 'cache_total': False})
+
+    return f"""
+    // First datatable page, rendered by index.html.twig before DataTables loads (deferLoading)
+    private function datatableFirstPage(): array
+    {{
+        $em = $this->tenantManager->getEntityManager();
+
+        {total_count}
+
+        $results = $em->createQueryBuilder()
+            {select_php(parts['selects'])}
             ->from('App\Entity\App\{entity_name}', 'e')
+            {join_logic}
             ->where('e.status = :status')
             ->setParameter('status', Status::ACTIVE)
+            ->orderBy('{order_by}', '{direction}'){tie_break}
+            ->setMaxResults({FIRST_PAGE_LENGTH})
             ->getQuery()
-            ->getSingleScalarResult();
+            ->getArrayResult();
 
         $data = [];
         foreach ($results as $item) {{
-            {config['data_mapping']}
+            {parts['row_mapping']}
         }}
 
-        return new JsonResponse([
-            'draw' => $draw,
+        return [
+            'rows' => $data,
             'recordsTotal' => $totalRecords,
+            'recordsFiltered' => $totalRecords,
+        ];
+    }}
+    """
+
+def index_route_name(config):
+    return config['route_name'].replace('_datatable', '_index')
+
+def pass_first_page(content, config):
+    """Hand datatableFirstPage() to the index action's render() call, None if not found"""
+    route = content.find(f"name: '{index_route_name(config)}'")
+    if route == -1:
+        return None
+    render = re.compile(r"\$this->render\(\s*'[^']+'\s*(?:,\s*\[([ \t]*\n([ \t]*))?|\))").search(content, route)
+    if render is None:
+        return None
+    if render.group(0).endswith(')'):
+        # render('x') without parameters
+        return content[:render.end() - 1] + ", ['datatable_first_page' => $this->datatableFirstPage()])" + content[render.end():]
+    if render.group(1) is None:
+        # render('x', [...]) on one line
+        return content[:render.end()] + "'datatable_first_page' => $this->datatableFirstPage(), " + content[render.end():]
+    return content[:render.end()] + f"'datatable_first_page' => $this->datatableFirstPage(),\n{render.group(2)}" + content[render.end():]
+
+def search_imports(config):
+    """`use` imports of the search code, shared by the datatable and export actions"""
+    if not config.get('folded_search'):
+        return []
+    imports = ["App\\EventListener\\DatatableSearchTextListener"]
+    if config['folded_search'] == 'fulltext':
+        imports.append("App\\Doctrine\\MatchAgainst")
+    return imports
+
+# Options that change what the datatable action queries or returns; the generated action
+# records them so a rerun can tell whether it still matches the config
+ENDPOINT_MODES = (
+    'cache_total', 'keyset', 'approximate_total', 'folded_search', 'response_cache', 'compact_rows', 'timing',
+)
+ENDPOINT_MODES_MARKER = "// implement_datatables modes: "
+ENDPOINT_MODES_PATTERN = re.compile(r"^[ \t]*" + re.escape(ENDPOINT_MODES_MARKER) + r"(.*)\n", re.MULTILINE)
+
+def endpoint_modes(config):
+    """Enabled endpoint modes as "keyset", "folded_search=prefix"..."""
+    modes = []
+    for key in ENDPOINT_MODES:
+        value = config.get(key)
+        if value:
+            modes.append(key if value is True else f"{key}={value}")
+    return modes
+
+def without_endpoint_modes(config):
+    """Config for JS talking to a hand-written action, which knows none of the endpoint modes"""
+    return {key: value for key, value in config.items() if key not in ENDPOINT_MODES}
+
+def serves_endpoint_modes(config, content):
+    """Whether the datatable action of a controller, if any, answers the configured endpoint modes
+
+    False only for an action without the modes marker: it was written by hand and is kept.
+    """
+    if f"name: '{config['route_name']}'" not in content or not endpoint_modes(config):
+        return True
+    existing = datatable_method_span(content, config['route_name'])
+    return existing is not None and existing[2] is not None
+
+def served_config(config):
+    """config as the controller on disk serves it, without the modes a kept hand-written action ignores"""
+    if not os.path.exists(config['controller']):
+        return config
+    with open(config['controller'], 'r') as f:
+        content = f.read()
+    return config if serves_endpoint_modes(config, content) else without_endpoint_modes(config)
+
+def php_block_end(content, open_brace):
+    """Offset just past the brace closing the one at open_brace, skipping strings and comments"""
+    depth = 0
+    position = open_brace
+    while position < len(content):
+        char = content[position]
+        if char in "'\"":
+            position += 1
+            while position < len(content) and content[position] != char:
+                position += 2 if content[position] == '\\' else 1
+        elif content.startswith('//', position) or char == '#' and not content.startswith('#[', position):
+            position = content.find('\n', position)
+            if position == -1:
+                return None
+        elif content.startswith('/*', position):
+            position = content.find('*/', position)
+            if position == -1:
+                return None
+            position += 1
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return position + 1
+        position += 1
+    return None
+
+def datatable_method_span(content, route_name):
+    """(start, end, recorded modes or None) of the action routed as route_name, marker line included"""
+    route = re.search(r"^[ \t]*#\[Route\([^\n]*name:\s*'" + re.escape(route_name) + r"'", content, re.MULTILINE)
+    if route is None:
+        return None
+    # Arguments may hold attributes with parentheses, never a brace: the first one opens the body
+    function = content.find('function ', route.end())
+    body = content.find('{', function) if function != -1 else -1
+    if body == -1:
+        return None
+    end = php_block_end(content, body)
+    if end is None:
+        return None
+
+    start = route.start()
+    modes = None
+    marker = ENDPOINT_MODES_PATTERN.search(content, content.rfind('\n', 0, start - 1) + 1, start)
+    if marker is not None and marker.end() == start:
+        start = marker.start()
+        modes = [mode for mode in marker.group(1).strip().split(', ') if mode and mode != 'none']
+    return start, end, modes
+
+def datatable_php(entity_name, config, parts):
+    """Datatable action of an entity, with the `use` imports its optional modes need"""
+    # Extra action arguments and imports required by the optional modes
+    action_args = ["string $dominio", "Request $request"]
+    imports = search_imports(config)
+    if config.get('cache_total'):
+        action_args.append("CacheInterface $cache")
+        imports += [
+            "App\\EventListener\\DatatableTotalCacheListener",
+            "Symfony\\Contracts\\Cache\\CacheInterface",
+            "Symfony\\Contracts\\Cache\\ItemInterface",
+        ]
+    if config.get('response_cache'):
+        action_args.append(f"#[Autowire(service: '{RESPONSE_CACHE_POOL}')] TagAwareAdapterInterface $datatableCache")
+        imports += [
+            "App\\EventListener\\DatatableResponseCacheListener",
+            "Symfony\\Component\\Cache\\Adapter\\TagAwareAdapterInterface",
+            "Symfony\\Component\\DependencyInjection\\Attribute\\Autowire",
+        ]
+    if config.get('timing'):
+        action_args += ["Stopwatch $stopwatch", "LoggerInterface $logger"]
+        imports += [
+            "Psr\\Log\\LoggerInterface",
+            "Symfony\\Component\\Stopwatch\\Stopwatch",
+        ]
+
+    # Keyset mode hands the client the cursor of the page it just got
+    extra_response = "\n            'cursor' => $cursor," if config.get('keyset') else ""
+    # Approximate mode tells the client how much to trust recordsFiltered
+    if config.get('approximate_total'):
+        extra_response += "\n            'totalEstimated' => $totalEstimated,"
+        extra_response += "\n            'filteredCount' => $filteredCount,"
+
+    # Construct datatable method
+    join_logic = "\n            ".join(parts['joins'])
+
+    # Query, counts and row mapping: everything a cached response skips
+    counts = f"""{total_count_php(entity_name, config)}
+
+        {filtered_count_php(config, parts)}"""
+    mapping = f"""$data = [];
+        foreach ($results as $item) {{
+            {parts['data_mapping']}
+        }}"""
+    query_code = f"""$qb = $em->createQueryBuilder()
+            {select_php(parts['selects'])}
+            ->from('App\Entity\App\{entity_name}', 'e')
+            {join_logic}
+            ->where('e.status = :status')
+            ->setParameter('status', Status::ACTIVE);
+
+        {search_php(config, parts)}
+
+        {timed_php(entity_name, config, 'count', counts)}
+
+        {timed_php(entity_name, config, 'query', pagination_php(config))}
+
+        {timed_php(entity_name, config, 'mapping', mapping)}"""
+    payload = f"""'recordsTotal' => $totalRecords,
             'recordsFiltered' => $totalFiltered,
-            'data' => $data,
-        ]);
+            'data' => $data,{extra_response}"""
+
+    if config.get('response_cache'):
+        response_code = response_cache_php(entity_name, config, parts, query_code, payload)
+    elif config.get('timing'):
+        response = f"""$response = new JsonResponse([
+            'draw' => $draw,
+            {payload}
+        ]);"""
+        response_code = f"""{query_code}
+
+        {timed_php(entity_name, config, 'encode', response)}
+
+        {timing_report_php(entity_name, config)}return $response;"""
+    else:
+        response_code = f"""{query_code}
+
+        return new JsonResponse([
+            'draw' => $draw,
+            {payload}
+        ]);"""
+    if config.get('timing'):
+        response_code = "$timings = [];\n\n        " + response_code
+
+    method_code = f"""
+    {ENDPOINT_MODES_MARKER}{', '.join(endpoint_modes(config)) or 'none'}
+    #[Route('/datatable', name: '{config['route_name']}', methods: ['GET'])]
+    public function datatable({', '.join(action_args)}): JsonResponse
+    {{
+        if (empty($dominio)) {{
+            throw $this->createNotFoundException('Dominio no especificado en la ruta.');
+        }}
+
+        $em = $this->tenantManager->getEntityManager();
+
+        // DataTables parameters
+        $draw = (int) $request->query->get('draw', 1);
+        $start = (int) $request->query->get('start', 0);
+        $length = (int) $request->query->get('length', 25);
+        
+        $search = $request->query->all('search');
+        $searchValue = isset($search['value']) ? $search['value'] : '';
+        
+        $order = $request->query->all('order');
+        $orderColumn = isset($order[0]['column']) ? (int) $order[0]['column'] : 0;
+        $orderDir = isset($order[0]['dir']) ? $order[0]['dir'] : 'asc';
+
+        $columns = {str(parts['columns'])};
+        $orderBy = isset($columns[$orderColumn]) ? $columns[$orderColumn] : 'e.id';
+
+        {response_code}
     }}
     """
 
-    # Insert method before the last closing brace
-    last_brace_pos = content.rfind('}')
-    new_content = content[:last_brace_pos] + method_code + content[last_brace_pos:]
+    return method_code, imports
 
-    with open(file_path, 'w') as f:
-        f.write(new_content)
-    
-    print(f"✅ Updated controller for {entity_name}")
+def update_controller(entity_name, config, stage):
+    """Add the datatable actions of an entity to its controller
 
-def update_template(entity_name, config):
-    file_path = config['template']
+    Returns whether the datatable action now serves the configured endpoint modes.
+    """
+    file_path = config['controller']
     if not os.path.exists(file_path):
-        print(f"❌ Template not found: {file_path}")
-        return
+        print(f"❌ Controller not found: {file_path}")
+        return False
 
     with open(file_path, 'r') as f:
         content = f.read()
 
-    # CSS Block to inject
-    css_block = """
+    has_datatable = f"name: '{config['route_name']}'" in content
+    has_export = f"name: '{export_route_name(config)}'" in content
+    # The first page only helps if update_template can swap the table for the include rendering it
+    # (update_template warns when it can't)
+    server_render = (
+        config.get('server_render')
+        and template_table_found(config)
+        and first_page_cells(entity_name, config, warn=False) is not None
+    )
+    has_first_page = not server_render or "function datatableFirstPage(" in content
+
+    # An action generated for other modes would not answer what the new JS asks: regenerate it.
+    # One without the modes marker was written by hand (access filters, eager loads...) and is kept
+    existing = datatable_method_span(content, config['route_name']) if has_datatable else None
+    stale = existing is not None and existing[2] is not None and existing[2] != endpoint_modes(config)
+    serves_modes = serves_endpoint_modes(config, content)
+    if not serves_modes:
+        print(f"⚠️ datatable() of {entity_name} was not generated by this script and is kept; its JS skips "
+              f"{', '.join(endpoint_modes(config))} (remove the action to regenerate it)")
+        if not has_export:
+            # Its columns come from the config, maybe not in the kept action's order
+            print(f"⏭️ Export action of {entity_name} skipped: it would not match the kept datatable()")
+            has_export = True
+
+    if has_datatable and not stale and has_export and has_first_page:
+        print(f"⚠️ Datatable endpoint already exists in {entity_name}")
+        return serves_modes
+
+    parts = query_parts(config)
+    methods = ""
+    imports = []
+    if stale:
+        print(f"🔄 Regenerating datatable endpoint of {entity_name} (modes: {', '.join(existing[2]) or 'none'} -> "
+              f"{', '.join(endpoint_modes(config)) or 'none'})")
+        method_code, imports = datatable_php(entity_name, config, parts)
+        start, end, _ = existing
+        content = content[:start] + method_code.strip('\n').rstrip() + content[end:]
+    elif has_datatable:
+        print(f"⚠️ Datatable endpoint already exists in {entity_name}, adding the missing actions only")
+    else:
+        # Add JsonResponse import if missing
+        if "use Symfony\Component\HttpFoundation\JsonResponse;" not in content:
+            content = content.replace("use Symfony\Component\HttpFoundation\Response;", 
+                                    "use Symfony\Component\HttpFoundation\Response;\nuse Symfony\Component\HttpFoundation\JsonResponse;")
+
+        unselected = sorted(set(ARRAY_KEY_PATTERN.findall(parts['data_mapping'])) - {key for _, key in parts['selects']})
+        if unselected:
+            print(f"⚠️ data_mapping of {entity_name} reads keys that are not selected: {', '.join(unselected)}")
+
+        method_code, imports = datatable_php(entity_name, config, parts)
+        methods += method_code
+
+    if not has_export:
+        methods += export_php(entity_name, config, parts)
+        imports += search_imports(config) + [
+            "Doctrine\\ORM\\AbstractQuery",
+            "Symfony\\Component\\HttpFoundation\\HeaderUtils",
+            "Symfony\\Component\\HttpFoundation\\StreamedResponse",
+        ]
+    if not has_first_page:
+        with_first_page = pass_first_page(content, config)
+        if with_first_page is None:
+            print(f"⚠️ render() of {index_route_name(config)} not found in {entity_name}, pass 'datatable_first_page' manually")
+        else:
+            content = with_first_page
+        methods += first_page_php(entity_name, config, parts)
+    content = add_use_statements(content, imports)
+
+    # Insert methods before the last closing brace
+    last_brace_pos = content.rfind('}')
+    new_content = content[:last_brace_pos] + methods + content[last_brace_pos:]
+
+    stage.write(file_path, new_content)
+    
+    print(f"✅ Updated controller for {entity_name}")
+    return serves_modes
+
+# Table replacement fallbacks, tried in order: (tag, predicate, replace inner content only)
+TABLE_FALLBACKS = [
+    # 1. Try to find the table container
+    ('div', class_starts_with('table-container'), False),
+    # 1b. Wrapper of the list templates (<div class="table-wrapper"><table class="data-table">)
+    ('div', class_starts_with('table-wrapper'), False),
+    # 2. Try to find any table with styled-table class
+    ('table', class_starts_with('styled-table'), False),
+    # 3. Try standard table class
+    ('table', class_starts_with('table'), False),
+    # 4. Fallback: Look for table-responsive
+    ('div', class_equals('table-responsive'), False),
+    # 5. Replace Card Grid (for Benefits, Events, etc.)
+    ('section', class_equals('container my-5'), True),
+    ('div', class_starts_with('row g-4'), False),
+]
+
+def parent_insert_edit(content, block_span, snippet):
+    """Edit inserting snippet after the {{ parent() }} call of a single Twig block span"""
+    start, end = block_span[:2]
+    parent_pos = content.find("{{ parent() }}", start, end)
+    if parent_pos == -1:
+        return None
+    insert_pos = parent_pos + len("{{ parent() }}")
+    return (insert_pos, insert_pos, "\n" + snippet)
+
+def table_found(spans):
+    """Whether any fallback matches, i.e. table_edits() will replace something"""
+    return any(spans.find_outermost(tag, predicate) for tag, predicate, _ in TABLE_FALLBACKS)
+
+def template_table_found(config):
+    """table_found() for the template of an entity"""
+    if not os.path.exists(config['template']):
+        return False
+    with open(config['template'], 'r') as f:
+        return table_found(TemplateSpans(f.read()))
+
+def table_edits(spans, table_html):
+    """Replace the first fallback that matches any element"""
+    for tag, predicate, inner_only in TABLE_FALLBACKS:
+        elements = spans.find_outermost(tag, predicate)
+        if elements:
+            if inner_only:
+                return [(e.open_end, e.close_start, table_html) for e in elements]
+            return [(e.start, e.end, table_html) for e in elements]
+    return []
+
+def search_filter_edits(spans, content):
+    """Remove the old filterTitle search scripts and the input wrapper"""
+    edits = []
+
+    # Remove old search scripts
+    if "document.getElementById('filterTitle')" in content:
+        for script in spans.find_all('script', lambda e: not e.attrs_text.strip()):
+            if 'filterTitle' in script.inner(content):
+                edits.append((script.start, script.end, ''))
+
+    # Remove old search input HTML (<div><img ...filter.svg><input id="filterTitle"></div>)
+    if 'id="filterTitle"' not in content:
+        return edits
+    for field in spans.find_all('input', lambda e: e.attrs.get('id') == 'filterTitle'):
+        wrapper = field.parent
+        if wrapper is None or wrapper.tag != 'div' or wrapper.end is None:
+            continue
+        icons = spans.find_all('img', lambda e: e.parent is wrapper and 'filter.svg' in e.attrs_text)
+        if icons:
+            edits.append((wrapper.start, wrapper.end, ''))
+
+    return edits
+
+# Vendored DataTables build, served by AssetMapper under a content-hashed URL
+# (the same files CrudConverter templates use)
+DATATABLES_JS_ASSET = "js/dataTables.min.js"
+DATATABLES_CSS_ASSET = "styles/dataTables.min.css"
+# The preload starts the script download with the page instead of after jQuery's ready.
+# Only for templates whose layout does not load DataTables itself: base.html.twig ships
+# 1.13 from the CDN, and 2.x CSS on top of it would fight its table.dataTable rules
+DATATABLES_ASSET_LINKS = f"""
+    <link rel="preload" href="{{{{ asset('{DATATABLES_JS_ASSET}') }}}}" as="script">
+    <link rel="stylesheet" href="{{{{ asset('{DATATABLES_CSS_ASSET}') }}}}">
+"""
+TWIG_EXTENDS_PATTERN = re.compile(r"{%-?\s*extends\s+['\"]([^'\"]+)['\"]")
+# A <script> loading any DataTables build, CDN or vendored
+DATATABLES_SCRIPT_PATTERN = re.compile(r"<script\b[^>]*\bsrc=[^>]*datatables[^>]*\.js", re.IGNORECASE)
+
+def layout_loads_datatables(content, templates_dir='templates'):
+    """Whether a layout the template extends, directly or not, already loads DataTables"""
+    seen = set()
+    extends = TWIG_EXTENDS_PATTERN.search(content)
+    while extends and extends.group(1) not in seen:
+        seen.add(extends.group(1))
+        layout_path = os.path.join(templates_dir, extends.group(1))
+        if not os.path.exists(layout_path):
+            return False
+        with open(layout_path, 'r') as f:
+            layout = f.read()
+        if DATATABLES_SCRIPT_PATTERN.search(layout):
+            return True
+        extends = TWIG_EXTENDS_PATTERN.search(layout)
+    return False
+
+# DataTables CSS, written to the "datatables" section of the shared stylesheet
+DATATABLES_CSS = """
     <style>
     /* ============================================
        DATATABLES CUSTOM STYLING
        ============================================ */
-    .dataTables_wrapper { color: var(--color-text-primary); font-family: "Montserrat", sans-serif; }
-    .dataTables_filter { margin-bottom: 1rem; }
-    .dataTables_filter label { color: var(--color-text-secondary); font-size: 14px; font-weight: 500; display: flex; align-items: center; gap: 0.75rem; }
-    .dataTables_filter input { background: var(--color-surface) !important; border: 1px solid var(--color-border) !important; border-radius: 8px !important; color: var(--color-text-primary) !important; padding: 0.5rem 0.75rem !important; font-size: 14px !important; margin-left: 0.5rem !important; width: 250px !important; }
-    .dataTables_length { margin-bottom: 1rem; }
-    .dataTables_length label { color: var(--color-text-secondary); font-size: 14px; font-weight: 500; }
-    .dataTables_length select { background: var(--color-surface) !important; border: 1px solid var(--color-border) !important; border-radius: 6px !important; color: var(--color-text-primary) !important; padding: 0.4rem 2rem 0.4rem 0.75rem !important; }
-    .dataTables_info { color: var(--color-text-secondary); font-size: 14px; padding: 1rem 0; }
-    .dataTables_paginate { padding: 1rem 0; }
-    .dataTables_paginate .paginate_button { background: var(--color-surface) !important; border: 1px solid var(--color-border) !important; border-radius: 6px !important; color: var(--color-text-primary) !important; padding: 0.5rem 0.75rem !important; margin: 0 0.25rem !important; font-size: 14px !important; cursor: pointer !important; text-decoration: none !important; box-shadow: none !important; }
-    .dataTables_paginate .paginate_button.current { background: var(--color-accent-blue) !important; border-color: var(--color-accent-blue) !important; color: #ffffff !important; }
-    .dataTables_paginate .paginate_button.disabled { opacity: 0.5 !important; cursor: not-allowed !important; }
-    .dataTables_processing { background: rgba(26, 31, 46, 0.95) !important; color: var(--color-text-primary) !important; border: 1px solid var(--color-border) !important; border-radius: 8px !important; padding: 1.5rem 2rem !important; }
+    .dataTables_wrapper, .dt-container { color: var(--color-text-primary); font-family: "Montserrat", sans-serif; }
+    .dataTables_filter, .dt-search { margin-bottom: 1rem; }
+    .dataTables_filter label, .dt-search label { color: var(--color-text-secondary); font-size: 14px; font-weight: 500; display: flex; align-items: center; gap: 0.75rem; }
+    .dataTables_filter input, .dt-search input { background: var(--color-surface) !important; border: 1px solid var(--color-border) !important; border-radius: 8px !important; color: var(--color-text-primary) !important; padding: 0.5rem 0.75rem !important; font-size: 14px !important; margin-left: 0.5rem !important; width: 250px !important; }
+    .dataTables_length, .dt-length { margin-bottom: 1rem; }
+    .dataTables_length label, .dt-length label { color: var(--color-text-secondary); font-size: 14px; font-weight: 500; }
+    .dataTables_length select, .dt-length select { background: var(--color-surface) !important; border: 1px solid var(--color-border) !important; border-radius: 6px !important; color: var(--color-text-primary) !important; padding: 0.4rem 2rem 0.4rem 0.75rem !important; }
+    .dataTables_info, .dt-info { color: var(--color-text-secondary); font-size: 14px; padding: 1rem 0; }
+    .dataTables_paginate, .dt-paging { padding: 1rem 0; }
+    .dataTables_paginate .paginate_button, .dt-paging .dt-paging-button { background: var(--color-surface) !important; border: 1px solid var(--color-border) !important; border-radius: 6px !important; color: var(--color-text-primary) !important; padding: 0.5rem 0.75rem !important; margin: 0 0.25rem !important; font-size: 14px !important; cursor: pointer !important; text-decoration: none !important; box-shadow: none !important; }
+    .dataTables_paginate .paginate_button.current, .dt-paging .dt-paging-button.current { background: var(--color-accent-blue) !important; border-color: var(--color-accent-blue) !important; color: #ffffff !important; }
+    .dataTables_paginate .paginate_button.disabled, .dt-paging .dt-paging-button.disabled { opacity: 0.5 !important; cursor: not-allowed !important; }
+    .dataTables_processing, .dt-processing { background: rgba(26, 31, 46, 0.95) !important; color: var(--color-text-primary) !important; border: 1px solid var(--color-border) !important; border-radius: 8px !important; padding: 1.5rem 2rem !important; }
     </style>
+"""
+
+# Pieces of a js_columns entry a server-rendered cell is built from
+JS_RENDER_LITERAL_PATTERN = re.compile(r"return\s*`(.*?)`", re.DOTALL)
+JS_CLASS_NAME_PATTERN = re.compile(r"className:\s*'([^']*)'")
+JS_TEMPLATE_ROW_PATTERN = re.compile(r"\$\{row\.(\w+)\}")
+
+def first_page_cells(entity_name, config, warn=True):
+    """Twig <td> of each JS column for the server-rendered first page, None if one can't be
+
+    data: 'name' -> {{ row.name }}; a render function returning a template literal is
+    reused as is, with ${row.id} / ${dominio} turned into Twig expressions.
+    """
+    cells = []
+    for column in config['js_columns']:
+        class_name = JS_CLASS_NAME_PATTERN.search(column)
+        td = f'<td class="{class_name.group(1)}">' if class_name else '<td>'
+        key = JS_DATA_KEY_PATTERN.search(column)
+        if 'render:' not in column and key:
+            cells.append(f"{td}{{{{ row.{key.group(1)} }}}}</td>")
+            continue
+
+        literal = JS_RENDER_LITERAL_PATTERN.search(column)
+        html = literal.group(1) if literal else ''
+        html = JS_TEMPLATE_ROW_PATTERN.sub(r"{{ row.\1 }}", html).replace('${dominio}', '{{ dominio }}')
+        if not literal or '${' in html:
+            if warn:
+                print(f"⚠️ A JS column of {entity_name} can't be rendered by Twig, skipping server_render")
+            return None
+        lines = [line.rstrip() for line in textwrap.dedent(html).strip('\n').split('\n')]
+        cells.append(td + "\n" + "\n".join(f"    {line}" for line in lines) + "\n</td>")
+    return cells
+
+def table_partial(config):
+    """_table_content.html.twig next to the entity's index, as a path and as a Twig name"""
+    path = os.path.join(os.path.dirname(config['template']), '_table_content.html.twig')
+    return path, os.path.relpath(path, 'templates').replace(os.sep, '/')
+
+def table_partial_twig(entity_name, config, cells):
+    indent = ' ' * 20
+    rows = "\n".join(indent + line for cell in cells for line in cell.split('\n'))
+    headers = "\n".join('                ' + header for header in config['table_headers'])
+    return f"""{{% set dominio = app.request.attributes.get('dominio') %}}
+{{# Generado por implement_datatables.py ("server_render"): la primera página llega en el HTML
+   y DataTables arranca con deferLoading, sin esperar una primera petición AJAX #}}
+
+<div class="table-wrapper">
+    <table id="{entity_name.lower()}-datatable" class="data-table" style="width:100%">
+        <thead>
+            <tr>
+{headers}
+            </tr>
+        </thead>
+        <tbody>
+            {{% for row in datatable_first_page.rows|default([]) %}}
+                <tr>
+{rows}
+                </tr>
+            {{% endfor %}}
+        </tbody>
+    </table>
+</div>
+"""
+
+def has_export_action(config, stage):
+    """Whether the controller, as staged so far, routes the export action of the datatable"""
+    try:
+        content = stage.read(config['controller'])
+    except FileNotFoundError:
+        return False
+    return f"name: '{export_route_name(config)}'" in content
+
+def export_controls_html(entity_name):
+    """CSV/JSONL buttons read by the [data-export-format] click handler of export_js()"""
+    table = f"#{entity_name.lower()}-datatable"
+    return f"""<div class="datatable-export d-flex justify-content-end gap-2 mb-2">
+        <a href="#" class="btn btn-sm btn-outline-secondary" data-export-format="csv" data-export-table="{table}">
+            <i class="fas fa-file-csv"></i> CSV
+        </a>
+        <a href="#" class="btn btn-sm btn-outline-secondary" data-export-format="jsonl" data-export-table="{table}">
+            <i class="fas fa-file-code"></i> JSONL
+        </a>
+    </div>
     """
 
-    # Inject CSS if not present
-    if "DATATABLES CUSTOM STYLING" not in content:
-        if "{% block stylesheets %}" in content:
-            content = content.replace("{{ parent() }}", "{{ parent() }}\n" + css_block)
+def export_controls_anchor(spans, replacements):
+    """Offset the export buttons go in front of: the replaced table, else the existing one"""
+    if replacements:
+        return min(start for start, _, _ in replacements)
+    for tag, predicate in (('div', class_starts_with('table-wrapper')), ('table', None)):
+        elements = spans.find_outermost(tag, predicate)
+        if elements:
+            return elements[0].start
+    return None
+
+def export_js(config):
+    """Click handler of the export buttons"""
+    return f"""
+
+        // Export the whole list with the table's current search and order
+        $(document).on('click', '[data-export-format]', function(e) {{
+            e.preventDefault();
+            const table = $($(this).data('export-table')).DataTable();
+            const params = {{
+                format: $(this).data('export-format'),
+                search: {{ value: table.search() }},
+                order: table.order().map(([column, dir]) => ({{ column, dir }}))
+            }};
+            window.location = '{{{{ path('{export_route_name(config)}', {{'dominio': dominio}}) }}}}?' + $.param(params);
+        }});"""
+
+def update_template(entity_name, config, index, stage):
+    file_path = config['template']
+    if not os.path.exists(file_path):
+        print(f"❌ Template not found: {file_path}")
+        return
+
+    with open(file_path, 'r') as f:
+        content = f.read()
+
+    # Every change below is an edit against the original content: the Twig blocks come from
+    # the project index and element spans from one tokenizer pass, then all edits are spliced at once
+    blocks = index.facts(file_path)['blocks']
+    spans = TemplateSpans(content)
+    edits = []
+
+    # Inject the DataTables assets and the shared stylesheet if not present (only into the stylesheets block)
+    stylesheet_html = ""
+    if DATATABLES_JS_ASSET not in content and not layout_loads_datatables(content):
+        stylesheet_html += DATATABLES_ASSET_LINKS
+    if SHARED_STYLESHEET_ASSET not in content:
+        stylesheet_html += f"    {STYLESHEET_LINK}\n"
+    if stylesheet_html and 'stylesheets' in blocks:
+        edits.append(parent_insert_edit(content, blocks['stylesheets'], stylesheet_html))
 
     # Table Structure
     table_html = f"""
@@ -530,76 +2069,77 @@ def update_template(entity_name, config):
     </div>
     """
 
-    # Robust replacement logic
-    # 1. Try to find the table container
-    if '<div class="table-container' in content:
-        content = re.sub(r'<div class="table-container.*?</div>\s*</div>', table_html + "\n    </div>", content, flags=re.DOTALL)
-    # 2. Try to find any table with styled-table class
-    elif '<table class="styled-table' in content:
-        # Find the parent div of the table if possible, or just replace the table
-        content = re.sub(r'<table class="styled-table.*?>.*?</table>', table_html, content, flags=re.DOTALL)
-    # 3. Try standard table class
-    elif '<table class="table' in content:
-        content = re.sub(r'<table class="table.*?>.*?</table>', table_html, content, flags=re.DOTALL)
-    # 4. Fallback: Look for table-responsive
-    elif '<div class="table-responsive">' in content:
-        content = re.sub(r'<div class="table-responsive">.*?</div>', table_html, content, flags=re.DOTALL)
-    # 5. Replace Card Grid (for Benefits, Events, etc.)
-    elif '<section class="container my-5">' in content:
-         content = re.sub(r'<section class="container my-5">.*?</section>', f'<section class="container my-5">{table_html}</section>', content, flags=re.DOTALL)
-    elif 'class="row g-4' in content:
-         content = re.sub(r'<div class="row g-4.*?</div>\s*</div>', table_html, content, flags=re.DOTALL)
-    else:
+    # Server-rendered first page: the table lives in _table_content.html.twig. Without a table
+    # to swap for the include, deferLoading would skip the first draw over an empty <tbody>
+    cells = None
+    if config.get('server_render'):
+        if table_found(spans):
+            cells = first_page_cells(entity_name, config)
+        else:
+            print(f"⚠️ No replaceable table in {entity_name}, skipping server_render")
+    if cells is not None:
+        partial_path, partial_name = table_partial(config)
+        stage.write(partial_path, table_partial_twig(entity_name, config, cells))
+        table_html = table_html[:table_html.index('    <div class="table-wrapper">')] + f"""    {{{{ include('{partial_name}') }}}}
+    """
+
+    # Robust replacement logic: balanced element lookups instead of DOTALL regexes
+    replacements = table_edits(spans, table_html)
+    if not replacements:
         print(f"⚠️ Could not find table to replace in {entity_name}, check manually.")
+    edits.extend(replacements)
 
-    # Remove old search scripts
-    if "document.getElementById('filterTitle')" in content:
-        content = re.sub(r'<script>.*?filterTitle.*?</script>', '', content, flags=re.DOTALL)
-    
-    # Remove old search input HTML
-    if 'id="filterTitle"' in content:
-         content = re.sub(r'<div.*?>\s*<img.*?filter.svg.*?>\s*<input.*?id="filterTitle".*?>\s*</div>', '', content, flags=re.DOTALL)
+    # Export buttons: their own edit, in front of the table whether or not it was replaced
+    export = has_export_action(config, stage)
+    if export and 'data-export-format' not in content:
+        anchor = export_controls_anchor(spans, replacements)
+        if anchor is None:
+            print(f"⚠️ No table found in {entity_name} to put the export buttons in front of, add them manually.")
+        else:
+            edits.append((anchor, anchor, export_controls_html(entity_name)))
+
+    # Remove old search scripts and input HTML
+    edits.extend(search_filter_edits(spans, content))
 
     # JS Block
-    js_columns = ",\n                ".join(config['js_columns'])
+    js_columns = config['js_columns']
+    if config.get('compact_rows'):
+        js_columns = positional_js_columns(entity_name, js_columns, positional_mapping(config['data_mapping'])[1])
+    js_columns = ",\n                ".join(js_columns)
+    keyset_state_js = """
+        // Keyset cursors by page start, see the ajax data/dataSrc callbacks
+        let keysetCursors = {};
+        let keysetState = '';
+""".rstrip() if config.get('keyset') else ""
     js_block = f"""
     <script>
+    // Vendored build, only injected (and preloaded) when the layout does not load DataTables
     function loadDataTables() {{
         return new Promise((resolve, reject) => {{
             if (typeof $.fn.DataTable !== 'undefined') {{ resolve(); return; }}
-            const css = document.createElement('link');
-            css.rel = 'stylesheet';
-            css.href = 'https://cdn.datatables.net/1.13.6/css/dataTables.bootstrap5.min.css';
-            document.head.appendChild(css);
-            const script1 = document.createElement('script');
-            script1.src = 'https://cdn.datatables.net/1.13.6/js/jquery.dataTables.min.js';
-            script1.onload = function() {{
-                const script2 = document.createElement('script');
-                script2.src = 'https://cdn.datatables.net/1.13.6/js/dataTables.bootstrap5.min.js';
-                script2.onload = resolve;
-                script2.onerror = reject;
-                document.head.appendChild(script2);
-            }};
-            script1.onerror = reject;
-            document.head.appendChild(script1);
+            const script = document.createElement('script');
+            script.src = '{{{{ asset('{DATATABLES_JS_ASSET}') }}}}';
+            script.onload = resolve;
+            script.onerror = reject;
+            document.head.appendChild(script);
         }});
     }}
 
-    $(document).ready(function() {{
+    $(document).ready(function() {{{keyset_state_js}
         loadDataTables().then(function() {{
             $('#{entity_name.lower()}-datatable').DataTable({{
                 processing: true,
                 serverSide: true,
                 ajax: {{
                     url: '{{{{ path('{config['route_name']}', {{'dominio': dominio}}) }}}}',
-                    type: 'GET'
+                    type: 'GET'{ajax_options_js(config)}
                 }},
                 columns: [
                     {js_columns}
                 ],
                 pageLength: 25,
                 lengthMenu: [[10, 25, 50, 100], [10, 25, 50, 100]],
-                order: [[1, 'desc']],
+                order: [[1, 'desc']],{defer_loading_js(cells)}{approximate_info_js(config)}
                 language: {{
                     processing: "Procesando...",
                     search: "Buscar:",
@@ -617,7 +2157,7 @@ def update_template(entity_name, config):
                     }}
                 }}
             }});
-        }});
+        }});{export_js(config) if export else ""}
         
         // Delete modal handling
         let itemIdToDelete = null;
@@ -643,16 +2183,38 @@ def update_template(entity_name, config):
     </script>
     """
 
-    if "{% block javascripts %}" in content:
-        content = content.replace("{{ parent() }}", "{{ parent() }}\n" + js_block)
+    if 'javascripts' in blocks:
+        edits.append(parent_insert_edit(content, blocks['javascripts'], js_block))
+
+    content = apply_edits(content, [edit for edit in edits if edit])
 
-    with open(file_path, 'w') as f:
-        f.write(content)
+    stage.write(file_path, content)
     
     print(f"✅ Updated template for {entity_name}")
 
 # Execute
-for entity, config in ENTITIES.items():
-    print(f"Processing {entity}...")
-    update_controller(entity, config)
-    update_template(entity, config)
+if __name__ == "__main__":
+    index = ProjectIndex('.')
+    stage = StagedWrites()
+    write_section(stage, 'datatables', DATATABLES_CSS)
+    # Configs as the controllers will serve them: the listeners and search_text follow these
+    served = {}
+    for entity, config in ENTITIES.items():
+        print(f"Processing {entity}...")
+        served[entity] = config
+        if not update_controller(entity, config, stage):
+            # The old action stays: keep the JS on the keyed rows and OFFSET pages it returns,
+            # and generate nothing else for modes it does not implement
+            served[entity] = without_endpoint_modes(config)
+            if endpoint_modes(config):
+                print(f"⏭️ {entity}: no listener or {SEARCH_TEXT_FIELD} column generated for {', '.join(endpoint_modes(config))}")
+        update_template(entity, served[entity], index, stage)
+        if served[entity].get('folded_search'):
+            add_search_text_property(entity, stage)
+    generate_total_cache_listener(served, stage)
+    generate_response_cache_listener(served, stage)
+    generate_search_text_listener(served, stage)
+    index.save()
+
+    # Nothing is written until every entity has been processed
+    print(f"💾 Wrote {stage.commit()} files")
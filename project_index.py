@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Project Index
+Shared on-disk cache of src/ and templates/ used by the codemod scripts
+
+Each entry is keyed by path and validated against mtime, size and content
+hash, so reruns only re-parse files that actually changed.
+
+Usage:
+    python project_index.py
+    python project_index.py --project-root ../otro-tenant
+"""
+
+import os
+import re
+import sys
+import json
+import hashlib
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+INDEX_VERSION = 1
+INDEX_FILENAME = '.codemod_index.json'
+INDEXED_DIRS = ('src', 'templates')
+INDEXED_SUFFIXES = ('.php', '.twig')
+
+# Patterns shared by the codemod scripts
+TWIG_BLOCK_TAG = re.compile(r'{%-?\s*(?:block\s+(\w+)([^%]*?)|endblock\b[^%]*?)\s*-?%}')
+TABLE_PATTERN = re.compile(r'<table[^>]*>.*?</table>', re.DOTALL)
+THEAD_PATTERN = re.compile(r'<thead[^>]*>(.*?)</thead>', re.DOTALL)
+ENTITY_TYPE_PATTERN = re.compile(r'->add\([^,]+,\s*EntityType::class,\s*\[(.*?)\]', re.DOTALL)
+
+SET_CURRENT_TENANT_MARKER = '->setCurrentTenant('
+
+
+def is_set_current_tenant_line(line: str) -> bool:
+    """Check whether a PHP line sets the tenant through the TenantManager"""
+    return SET_CURRENT_TENANT_MARKER in line and ('$this->tenantManager' in line or '$tenantManager' in line)
+
+
+def extract_twig_blocks(content: str) -> Dict[str, List[int]]:
+    """Map block name to [start, end, inner_start, inner_end], honouring nesting"""
+    blocks = {}
+    stack = []
+    for match in TWIG_BLOCK_TAG.finditer(content):
+        name, rest = match.group(1), match.group(2)
+        if name is None:
+            if stack:
+                block_name, start, inner_start = stack.pop()
+                blocks.setdefault(block_name, [start, match.end(), inner_start, match.start()])
+        elif not (rest or '').strip():
+            stack.append((name, match.start(), match.end()))
+        # {% block title 'x' %} is a shortcut block without {% endblock %}
+    return blocks
+
+
+def extract_php_facts(content: str) -> Dict:
+    """Facts needed by verificar_formtypes_multitenant.py and clean_controllers.py"""
+    facts = {
+        'uses_entity_type': 'EntityType::class' in content,
+        'entity_type_blocks': [],
+        'tenant_manager': {
+            'import': 'use App\\Service\\TenantManager;' in content,
+            'property': 'private TenantManager $tenantManager;' in content,
+            'constructor': 'public function __construct(TenantManager $tenantManager)' in content,
+        },
+        'set_current_tenant_lines': [],
+    }
+
+    if facts['uses_entity_type']:
+        facts['entity_type_blocks'] = ENTITY_TYPE_PATTERN.findall(content)
+
+    if SET_CURRENT_TENANT_MARKER in content:
+        for lineno, line in enumerate(content.splitlines(), 1):
+            if is_set_current_tenant_line(line):
+                facts['set_current_tenant_lines'].append([lineno, line.strip()])
+
+    return facts
+
+
+def extract_twig_facts(content: str) -> Dict:
+    """Facts needed by unify_styles.py, implement_datatables.py and convert_crud_to_datatable.py"""
+    return {
+        'blocks': extract_twig_blocks(content),
+        'tables': [[m.start(), m.end()] for m in TABLE_PATTERN.finditer(content)],
+        'theads': [[m.start(), m.end(), m.start(1), m.end(1)] for m in THEAD_PATTERN.finditer(content)],
+    }
+
+
+def extract_facts(rel_path: str, content: str) -> Dict:
+    """Extract the facts for a single file based on its extension"""
+    if rel_path.endswith('.php'):
+        return extract_php_facts(content)
+    if rel_path.endswith('.twig'):
+        return extract_twig_facts(content)
+    return {}
+
+
+class ProjectIndex:
+    """Cached per-file facts for a Symfony project, persisted as JSON"""
+
+    def __init__(self, project_root: str = '.', index_path: Optional[str] = None):
+        self.project_root = Path(project_root).resolve()
+        self.index_path = Path(index_path) if index_path else self.project_root / INDEX_FILENAME
+        self.entries: Dict[str, Dict] = {}
+        self.dirty = False
+        # Keys updated or dropped since load, see changes()
+        self.touched = set()
+        self.parsed = 0
+        self.reused = 0
+        self.load()
+
+    def load(self):
+        """Load the index from disk, discarding it if the format changed"""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if data.get('version') == INDEX_VERSION:
+            self.entries = data.get('entries', {})
+
+    def save(self):
+        """Persist the index atomically if anything changed"""
+        if not self.dirty:
+            return
+
+        tmp_path = self.index_path.with_name(f'{self.index_path.name}.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': INDEX_VERSION, 'entries': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+        self.touched.clear()
+
+    def relative(self, path) -> str:
+        """Normalise a path (absolute or relative to the cwd) to an index key"""
+        return Path(os.path.relpath(Path(path).resolve(), self.project_root)).as_posix()
+
+    def facts(self, path) -> Optional[Dict]:
+        """Return up-to-date facts for path, re-parsing only when its content changed"""
+        key = self.relative(path)
+        full_path = self.project_root / key
+
+        try:
+            stat = full_path.stat()
+        except OSError:
+            if self.entries.pop(key, None) is not None:
+                self.touched.add(key)
+                self.dirty = True
+            return None
+
+        entry = self.entries.get(key)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            self.reused += 1
+            return entry['facts']
+
+        raw = full_path.read_bytes()
+        digest = hashlib.sha1(raw).hexdigest()
+
+        if entry and entry['sha1'] == digest:
+            # Touched but unchanged: refresh the stat key, keep the facts
+            self.reused += 1
+        else:
+            self.parsed += 1
+            # Same newline translation as open(..., 'r'), so offsets match what scripts read
+            content = raw.decode('utf-8', errors='replace').replace('\r\n', '\n').replace('\r', '\n')
+            entry = {'sha1': digest, 'facts': extract_facts(key, content)}
+
+        entry['mtime_ns'] = stat.st_mtime_ns
+        entry['size'] = stat.st_size
+        self.entries[key] = entry
+        self.touched.add(key)
+        self.dirty = True
+        return entry['facts']
+
+    def digest(self, path) -> Optional[str]:
+        """Return the up-to-date sha1 of path's content"""
+        if self.facts(path) is None:
+            return None
+        return self.entries[self.relative(path)]['sha1']
+
+    def refresh(self, directories: Tuple[str, ...] = INDEXED_DIRS) -> Tuple[int, int]:
+        """Walk the indexed directories, updating changed files and dropping removed ones"""
+        seen = set()
+        for directory in directories:
+            for root, _, files in os.walk(self.project_root / directory):
+                for file in files:
+                    if file.endswith(INDEXED_SUFFIXES):
+                        path = os.path.join(root, file)
+                        seen.add(self.relative(path))
+                        self.facts(path)
+
+        prefixes = tuple(d.rstrip('/') + '/' for d in directories)
+        for key in [k for k in self.entries if k.startswith(prefixes) and k not in seen]:
+            del self.entries[key]
+            self.touched.add(key)
+            self.dirty = True
+
+        return self.parsed, self.reused
+
+    def changes(self) -> Tuple[Dict[str, Dict], List[str]]:
+        """Entries updated and keys dropped since load, for merge() into another index"""
+        updated = {key: self.entries[key] for key in self.touched if key in self.entries}
+        removed = [key for key in self.touched if key not in self.entries]
+        return updated, removed
+
+    def merge(self, updated: Dict[str, Dict], removed: List[str]):
+        """Apply the changes() of another instance, e.g. a worker process, before a single save()"""
+        for key, entry in updated.items():
+            self.entries[key] = entry
+            self.touched.add(key)
+        for key in removed:
+            if self.entries.pop(key, None) is not None:
+                self.touched.add(key)
+        if updated or removed:
+            self.dirty = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or refresh the shared codemod project index')
+    parser.add_argument(
+        '--project-root',
+        type=str,
+        default='.',
+        help='Path to project root (default: current directory)'
+    )
+    args = parser.parse_args()
+
+    index = ProjectIndex(args.project_root)
+    parsed, reused = index.refresh()
+    index.save()
+
+    print(f"✅ Indexed {len(index.entries)} files ({parsed} parsed, {reused} reused) -> {index.index_path}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
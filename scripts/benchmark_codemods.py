@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Codemod Benchmark
+Times the codemod scripts against a synthetic Symfony tree of N files
+
+Every (phase, size) pair runs in a fresh process on a tree freshly generated by
+the parent, so the reported peak RSS belongs to that phase alone.
+
+Usage:
+    python scripts/benchmark_codemods.py
+    python scripts/benchmark_codemods.py --sizes 100,1000 --phases unify_styles,verificar_formtype
+    python scripts/benchmark_codemods.py --json bench.jsonl
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import multiprocessing
+from contextlib import redirect_stdout
+from pathlib import Path
+from queue import Empty
+from typing import Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / 'scripts'))
+
+DEFAULT_SIZES = [100, 1000, 10000]
+# How often run_isolated checks that the measured process is still alive
+RESULT_POLL_S = 1.0
+
+CONTROLLER_TEMPLATE = '''<?php
+
+namespace App\\Controller;
+
+use App\\Entity\\App\\{entity};
+use App\\Enum\\Status;
+use App\\Service\\TenantManager;
+use Symfony\\Bundle\\FrameworkBundle\\Controller\\AbstractController;
+use Symfony\\Component\\HttpFoundation\\Request;
+use Symfony\\Component\\HttpFoundation\\Response;
+use Symfony\\Component\\Routing\\Attribute\\Route;
+
+#[Route('/{{dominio}}/{slug}')]
+final class {entity}Controller extends AbstractController
+{{
+    private TenantManager $tenantManager;
+
+    public function __construct(TenantManager $tenantManager)
+    {{
+        $this->tenantManager = $tenantManager;
+    }}
+
+    #[Route('/', name: 'app_{slug}_index', methods: ['GET'])]
+    public function index(string $dominio): Response
+    {{
+        $this->tenantManager->setCurrentTenant($dominio);
+        $em = $this->tenantManager->getEntityManager();
+        ${slug}s = $em->getRepository({entity}::class)->findBy(['status' => Status::ACTIVE]);
+
+        return $this->render('{slug}/index.html.twig', [
+            '{slug}s' => ${slug}s,
+        ]);
+    }}
+
+    #[Route('/{{id}}', name: 'app_{slug}_show', methods: ['GET'])]
+    public function show(string $dominio, int $id): Response
+    {{
+        $this->tenantManager->setCurrentTenant($dominio);
+        ${slug} = $this->tenantManager->getEntityManager()->getRepository({entity}::class)->find($id);
+
+        return $this->render('{slug}/show.html.twig', [
+            '{slug}' => ${slug},
+        ]);
+    }}
+}}
+'''
+
+INDEX_TEMPLATE = '''{{% extends 'base.html.twig' %}}
+
+{{% set dominio = app.request.attributes.get('dominio') %}}
+
+{{% block title %}}{entity}{{% endblock %}}
+
+{{% block stylesheets %}}
+    {{{{ parent() }}}}
+    <link rel="stylesheet" href="{{{{ asset('css/admin-theme.css') }}}}">
+{{% endblock %}}
+
+{{% block body %}}
+    <section class="header-sntiasg-b">
+        <div class="container-fluid container-header">
+            <h1 class="title-sntiasg">{entity}</h1>
+        </div>
+    </section>
+
+    <div class="container-fluid px-5">
+        <div class="d-flex align-items-center">
+            <img src="{{{{ asset('images/icons/filter.svg') }}}}" alt="Filtro">
+            <input type="text" id="filterTitle" class="form-control" placeholder="Buscar">
+        </div>
+        <div class="table-container mt-3">
+            <div class="table-responsive">
+                <table class="styled-table w-100">
+                    <thead>
+                        <tr>
+                            <th>NOMBRE</th>
+                            <th>ESTADO</th>
+                            <th>ACCIONES</th>
+                        </tr>
+                    </thead>
+                    <tbody>
+                    {{% for {slug} in {slug}s %}}
+                        <tr>
+                            <td>{{{{ {slug}.name }}}}</td>
+                            <td>{{{{ {slug}.status.value }}}}</td>
+                            <td>
+                                <a href="{{{{ path('app_{slug}_show', {{'dominio': dominio, 'id': {slug}.id}}) }}}}">Ver</a>
+                                {{{{ include('{slug}/_delete_form.html.twig') }}}}
+                            </td>
+                        </tr>
+                    {{% else %}}
+                        <tr><td colspan="3">Sin registros</td></tr>
+                    {{% endfor %}}
+                    </tbody>
+                </table>
+            </div>
+        </div>
+    </div>
+{{% endblock %}}
+
+{{% block javascripts %}}
+    {{{{ parent() }}}}
+    <script>
+        document.getElementById('filterTitle').addEventListener('input', function () {{
+            const term = this.value.toLowerCase();
+            document.querySelectorAll('.styled-table tbody tr').forEach(function (row) {{
+                row.style.display = row.textContent.toLowerCase().includes(term) ? '' : 'none';
+            }});
+        }});
+    </script>
+{{% endblock %}}
+'''
+
+FORM_TYPE_TEMPLATE = '''<?php
+
+namespace App\\Form;
+
+use App\\Entity\\App\\{entity};
+use App\\Entity\\App\\Region;
+use App\\Service\\TenantManager;
+use Doctrine\\ORM\\EntityRepository;
+use Symfony\\Bridge\\Doctrine\\Form\\Type\\EntityType;
+use Symfony\\Component\\Form\\AbstractType;
+use Symfony\\Component\\Form\\FormBuilderInterface;
+use Symfony\\Component\\OptionsResolver\\OptionsResolver;
+
+class {entity}Type extends AbstractType
+{{
+    private TenantManager $tenantManager;
+
+    public function __construct(TenantManager $tenantManager)
+    {{
+        $this->tenantManager = $tenantManager;
+    }}
+    public function buildForm(FormBuilderInterface $builder, array $options): void
+    {{
+        $builder
+            ->add('name', null, [
+                'label' => 'Nombre *',
+                'attr' => ['class' => 'form-control form-inpunt-sntiasg'],
+            ])
+            ->add('region', EntityType::class, [
+                'label' => 'Región *',
+                'class' => Region::class,
+                'choice_label' => 'name',
+                'em' => $this->tenantManager->getEntityManager(),
+                'query_builder' => function (EntityRepository $er) {{
+                    return $er->createQueryBuilder('r')->orderBy('r.name', 'ASC');
+                }},
+            ])
+        ;
+    }}
+
+    public function configureOptions(OptionsResolver $resolver): void
+    {{
+        $resolver->setDefaults([
+            'data_class' => {entity}::class,
+        ]);
+    }}
+}}
+'''
+
+
+def entity_names(size: int) -> List[str]:
+    return [f'Entity{i}' for i in range(size)]
+
+
+def generate_project(root: Path, size: int):
+    """Write N controllers, N index templates and N FormTypes under root"""
+    (root / 'src' / 'Controller').mkdir(parents=True)
+    (root / 'src' / 'Form').mkdir(parents=True)
+
+    for entity in entity_names(size):
+        slug = entity.lower()
+        (root / 'src' / 'Controller' / f'{entity}Controller.php').write_text(
+            CONTROLLER_TEMPLATE.format(entity=entity, slug=slug), encoding='utf-8')
+        (root / 'src' / 'Form' / f'{entity}Type.php').write_text(
+            FORM_TYPE_TEMPLATE.format(entity=entity), encoding='utf-8')
+        template_dir = root / 'templates' / slug
+        template_dir.mkdir(parents=True)
+        (template_dir / 'index.html.twig').write_text(
+            INDEX_TEMPLATE.format(entity=entity, slug=slug), encoding='utf-8')
+
+
+def run_implement_datatables(root: Path, size: int):
+    import implement_datatables
+    from project_index import ProjectIndex
+    from staged_writes import StagedWrites
+
+    base = implement_datatables.ENTITIES['Region']
+    index = ProjectIndex(str(root))
+    stage = StagedWrites()
+    for entity in entity_names(size):
+        slug = entity.lower()
+        config = dict(
+            base,
+            controller=f'src/Controller/{entity}Controller.php',
+            template=f'templates/{slug}/index.html.twig',
+            route_name=f'app_{slug}_datatable',
+        )
+        implement_datatables.update_controller(entity, config, stage)
+        implement_datatables.update_template(entity, config, index, stage)
+    index.save()
+    stage.commit()
+
+
+def run_unify_styles(root: Path, size: int):
+    import unify_styles
+    from project_index import ProjectIndex
+    from staged_writes import StagedWrites
+
+    index = ProjectIndex(str(root))
+    stage = StagedWrites()
+    for entity in entity_names(size):
+        slug = entity.lower()
+        config = {
+            'template': f'templates/{slug}/index.html.twig',
+            'title': entity.upper(),
+            'new_route': f'app_{slug}_new',
+            'table_id': f'{slug}-datatable',
+        }
+        unify_styles.unify_styles(entity, config, index, stage)
+    index.save()
+    stage.commit()
+
+
+def run_crud_converter(root: Path, size: int):
+    import convert_crud_to_datatable as converter_module
+    from project_index import ProjectIndex
+    from staged_writes import StagedWrites
+
+    base = converter_module.CRUD_CONFIG['region']
+    index = ProjectIndex(str(root))
+    stage = StagedWrites()
+    for entity in entity_names(size):
+        slug = entity.lower()
+        converter_module.CRUD_CONFIG[slug] = dict(
+            base,
+            collection_var=f'{slug}s',
+            single_var=slug,
+            table_id=f'{slug}s-datatable',
+            route_prefix=f'app_{slug}',
+        )
+        converter_module.convert_entity(slug, str(root), False, stage, index)
+    index.save()
+    stage.commit()
+
+
+def run_verificar_formtype(root: Path, size: int):
+    import verificar_formtypes_multitenant
+    from project_index import ProjectIndex
+
+    index = ProjectIndex(str(root))
+    for entity in entity_names(size):
+        verificar_formtypes_multitenant.verificar_formtype(f'src/Form/{entity}Type.php', index)
+    index.save()
+
+
+def run_clean_controllers(root: Path, size: int):
+    import clean_controllers
+    clean_controllers.clean_controllers('src/Controller')
+
+
+PHASES: Dict[str, Callable[[Path, int], None]] = {
+    'implement_datatables': run_implement_datatables,
+    'unify_styles': run_unify_styles,
+    'crud_converter': run_crud_converter,
+    'verificar_formtype': run_verificar_formtype,
+    'clean_controllers': run_clean_controllers,
+}
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS of the current process (ru_maxrss is KB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def measure(phase: str, size: int, root: str, queue):
+    """Child process: run one phase on an already generated tree, report the numbers"""
+    try:
+        queue.put(measure_phase(phase, size, Path(root)))
+    except Exception as e:
+        queue.put({'phase': phase, 'files': size, 'error': f'{type(e).__name__}: {e}'})
+
+
+def measure_phase(phase: str, size: int, root: Path) -> Dict:
+    os.chdir(root)
+
+    # The scripts log every file; keep that out of the terminal but inside the timing
+    with redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        PHASES[phase](root, size)
+        wall = time.perf_counter() - start
+
+    return {
+        'phase': phase,
+        'files': size,
+        'wall_s': round(wall, 4),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'files_per_s': round(size / wall, 1) if wall else None,
+    }
+
+
+def run_isolated(phase: str, size: int) -> Dict:
+    # Generated here, so the child's peak RSS holds none of the generator's allocations
+    with tempfile.TemporaryDirectory(prefix='codemod-bench-') as tmp:
+        generate_project(Path(tmp), size)
+        context = multiprocessing.get_context('spawn')
+        queue = context.Queue()
+        process = context.Process(target=measure, args=(phase, size, tmp, queue))
+        process.start()
+        result = None
+        while result is None:
+            alive = process.is_alive()
+            try:
+                result = queue.get(timeout=RESULT_POLL_S)
+            except Empty:
+                # Crashed or OOM-killed children never report: fail the phase instead of waiting forever
+                # (checked before the last get, so a result put just before exiting is not lost)
+                if not alive:
+                    result = {'phase': phase, 'files': size,
+                              'error': f'process exited with code {process.exitcode} without a result'}
+        process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the codemod scripts on a synthetic Symfony tree')
+    parser.add_argument(
+        '--sizes',
+        type=str,
+        default=','.join(str(size) for size in DEFAULT_SIZES),
+        help='Comma-separated number of files per kind (default: 100,1000,10000)'
+    )
+    parser.add_argument(
+        '--phases',
+        type=str,
+        default=','.join(PHASES),
+        help=f'Comma-separated phases to run (default: all of {", ".join(PHASES)})'
+    )
+    parser.add_argument(
+        '--json',
+        type=str,
+        help='Append results as JSON lines to this file'
+    )
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',')]
+    phases = [phase.strip() for phase in args.phases.split(',')]
+    for phase in phases:
+        if phase not in PHASES:
+            print(f"Error: Unknown phase '{phase}'")
+            print(f"Available phases: {', '.join(PHASES)}")
+            return 1
+
+    print(f"{'phase':<22} {'files':>7} {'wall (s)':>10} {'peak RSS (MB)':>14} {'files/s':>10}")
+    print('-' * 67)
+
+    for phase in phases:
+        for size in sizes:
+            result = run_isolated(phase, size)
+            if 'error' in result:
+                print(f"{phase:<22} {size:>7} failed: {result['error']}")
+                continue
+            print(f"{result['phase']:<22} {result['files']:>7} {result['wall_s']:>10.3f} "
+                  f"{result['peak_rss_mb']:>14.1f} {result['files_per_s'] or 0:>10.1f}")
+            if args.json:
+                with open(args.json, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(result) + '\n')
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
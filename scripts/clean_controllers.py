@@ -1,42 +1,121 @@
+"""
+Elimina las llamadas ->setCurrentTenant(...) hechas a través del TenantManager
+
+Uso:
+    python scripts/clean_controllers.py src/Controller
+    python scripts/clean_controllers.py ../tenant-a/src ../tenant-b/src --jobs 8
+"""
+
 import os
-import re
+import sys
+import mmap
+import argparse
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from project_index import SET_CURRENT_TENANT_MARKER, is_set_current_tenant_line
+
+MARKER_BYTES = SET_CURRENT_TENANT_MARKER.encode('utf-8')
+
+def iter_php_files(directory):
+    """Recorrer el directorio con os.scandir, sin seguir enlaces simbólicos"""
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        try:
+            with os.scandir(current) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                    elif entry.name.endswith(".php") and entry.is_file(follow_symlinks=False):
+                        yield entry.path
+        except OSError as e:
+            print(f"  [Omitido] {current}: {e}")
+
+def contains_marker(file_path):
+    """Pre-filtro a nivel de bytes: los archivos sin el marcador nunca se decodifican"""
+    with open(file_path, 'rb') as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return data.find(MARKER_BYTES) != -1
+        except ValueError:
+            # Archivo vacío
+            return False
+
+def clean_file(file_path):
+    """Reescribir el archivo línea a línea en un temporal y reemplazarlo de forma atómica"""
+    if not contains_marker(file_path):
+        return []
+
+    removed = []
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(file_path), prefix=".clean_", suffix=".tmp")
+    try:
+        # newline='' conserva los finales de línea originales
+        with open(file_path, 'r', encoding='utf-8', newline='') as src, \
+                os.fdopen(fd, 'w', encoding='utf-8', newline='') as dst:
+            for line in src:
+                # Patrón para detectar setCurrentTenant
+                if is_set_current_tenant_line(line):
+                    removed.append(line.strip())
+                    continue
+                dst.write(line)
 
-def clean_controllers(directory):
+        if removed:
+            shutil.copymode(file_path, tmp_path)
+            os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+    return removed
+
+def clean_controllers(directory, jobs=None):
     count_files = 0
     count_lines = 0
-    
+
     print(f"Iniciando limpieza en: {directory}")
-    
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.endswith(".php"):
-                file_path = os.path.join(root, file)
-                
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    lines = f.readlines()
-                
-                new_lines = []
-                modified = False
-                
-                for line in lines:
-                    # Patrón para detectar setCurrentTenant
-                    if '->setCurrentTenant(' in line and ('$this->tenantManager' in line or '$tenantManager' in line):
-                        print(f"  [Eliminando] {file}: {line.strip()}")
-                        modified = True
-                        count_lines += 1
-                        continue
-                    
-                    new_lines.append(line)
-                
-                if modified:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.writelines(new_lines)
-                    count_files += 1
+
+    # Los hilos solo devuelven las líneas eliminadas; se imprimen aquí para no mezclar la salida
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        files = list(iter_php_files(directory))
+        for file_path, removed in zip(files, executor.map(clean_file, files)):
+            for line in removed:
+                print(f"  [Eliminando] {os.path.basename(file_path)}: {line}")
+            if removed:
+                count_files += 1
+                count_lines += len(removed)
 
     print(f"\nResumen:")
     print(f"Archivos modificados: {count_files}")
     print(f"Líneas eliminadas: {count_lines}")
 
+    return count_files, count_lines
+
+def main():
+    parser = argparse.ArgumentParser(description='Eliminar las llamadas setCurrentTenant del TenantManager')
+    parser.add_argument(
+        'directories',
+        nargs='+',
+        help='Directorios a limpiar (p. ej. src/Controller de cada checkout)'
+    )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=None,
+        help='Número de hilos de trabajo (default: según los CPUs disponibles)'
+    )
+    args = parser.parse_args()
+
+    for directory in args.directories:
+        if not os.path.isdir(directory):
+            print(f"❌ Directorio {directory} no encontrado")
+            return 1
+        clean_controllers(directory, args.jobs)
+
+    return 0
+
 if __name__ == "__main__":
-    target_dir = "/home/masoftcode/Github/app-ctm/src/Controller"
-    clean_controllers(target_dir)
+    sys.exit(main())
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Shared Stylesheet
+One versioned CSS file for the list pages instead of a <style> copy per template
+
+unify_styles.py and implement_datatables.py each own a section of
+assets/styles/list-pages.css and link it through asset(); AssetMapper serves it
+under a content-hashed URL, so browsers download it once and cache it across pages.
+Run directly, it strips the <style> copies earlier runs inlined into templates.
+
+Usage:
+    python shared_stylesheet.py
+    python shared_stylesheet.py --project-root ../otro-tenant --dry-run
+"""
+
+import os
+import re
+import sys
+import argparse
+import textwrap
+from typing import List, Set, Tuple
+
+from staged_writes import StagedWrites
+from template_tokenizer import TemplateSpans, apply_edits
+
+SHARED_STYLESHEET = 'assets/styles/list-pages.css'
+SHARED_STYLESHEET_ASSET = 'styles/list-pages.css'
+STYLESHEET_LINK = f"<link rel=\"stylesheet\" href=\"{{{{ asset('{SHARED_STYLESHEET_ASSET}') }}}}\">"
+
+# Non-blocking variant for pages that inline their critical rules (see critical_css)
+STYLESHEET_DEFERRED_LINK = (
+    f"<link rel=\"preload\" href=\"{{{{ asset('{SHARED_STYLESHEET_ASSET}') }}}}\" as=\"style\" "
+    f"onload=\"this.onload=null;this.rel='stylesheet'\">\n"
+    f"    <noscript>{STYLESHEET_LINK}</noscript>"
+)
+
+STYLESHEET_HEADER = """/*
+ * Estilos compartidos de los listados.
+ * Generado por unify_styles.py / implement_datatables.py: cada sección la reescribe su script.
+ */
+"""
+
+# Opening comment of each section's CSS, i.e. how an inlined copy is recognized
+INLINE_MARKERS = {
+    'master': 'PALETA REFINADA',
+    'datatables': 'DATATABLES CUSTOM STYLING',
+}
+
+
+def section_pattern(name: str) -> re.Pattern:
+    return re.compile(rf'/\* @section {name} \*/\n.*?/\* @endsection {name} \*/\n', re.DOTALL)
+
+
+def style_css(style_block: str) -> str:
+    """CSS text of a <style> block, dedented"""
+    css = re.sub(r'^<style[^>]*>|</style>$', '', style_block.strip())
+    return textwrap.dedent(css.strip('\n')).strip() + '\n'
+
+
+def write_section(stage: StagedWrites, name: str, style_block: str, project_root: str = '.'):
+    """Stage the shared stylesheet with section `name` set to the CSS of style_block"""
+    path = os.path.join(project_root, SHARED_STYLESHEET)
+    try:
+        current = stage.read(path)
+    except FileNotFoundError:
+        current = STYLESHEET_HEADER
+
+    section = f"/* @section {name} */\n{style_css(style_block)}/* @endsection {name} */\n"
+    pattern = section_pattern(name)
+    if pattern.search(current):
+        updated = pattern.sub(lambda _: section, current, count=1)
+    else:
+        updated = current.rstrip('\n') + '\n\n' + section
+
+    if updated != current:
+        stage.write(path, updated)
+
+
+CSS_COMMENT = re.compile(r'/\*.*?\*/', re.DOTALL)
+# Parts of a selector that never decide whether the page uses it
+SELECTOR_ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+SELECTOR_PSEUDO = re.compile(r'::?[\w-]+(?:\([^)]*\))?')
+SELECTOR_NAME = re.compile(r'([.#]?)(-?[A-Za-z_][\w-]*)')
+KEYFRAMES_NAME = re.compile(r'@(?:-\w+-)?keyframes\s+([\w-]+)')
+
+HTML_CLASS = re.compile(r'\bclass\s*=\s*"([^"]*)"')
+HTML_ID = re.compile(r'\bid\s*=\s*"([^"]*)"')
+HTML_TAG = re.compile(r'<([a-zA-Z][\w-]*)')
+TWIG_EXPRESSION = re.compile(r'{{.*?}}|{%.*?%}', re.DOTALL)
+# The markup of a block always sits inside these
+ALWAYS_USED = {'html', 'body'}
+
+
+def css_rules(css: str) -> List[Tuple[str, str]]:
+    """Top-level (prelude, body) pairs of a stylesheet, comments removed"""
+    css = CSS_COMMENT.sub('', css)
+    rules = []
+    depth = 0
+    prelude_start = body_start = 0
+    for position, char in enumerate(css):
+        if char == '{':
+            if depth == 0:
+                body_start = position + 1
+            depth += 1
+        elif char == '}' and depth:
+            depth -= 1
+            if depth == 0:
+                rules.append((css[prelude_start:body_start - 1].strip(), css[body_start:position]))
+                prelude_start = position + 1
+    return rules
+
+
+def used_names(html: str) -> Set[str]:
+    """Classes (.x), ids (#x) and tag names the markup uses"""
+    names = set(ALWAYS_USED)
+    for value in HTML_CLASS.findall(html):
+        names.update('.' + name for name in TWIG_EXPRESSION.sub(' ', value).split())
+    for value in HTML_ID.findall(html):
+        names.update('#' + name for name in TWIG_EXPRESSION.sub(' ', value).split())
+    names.update(tag.lower() for tag in HTML_TAG.findall(html))
+    return names
+
+
+def selector_used(selector: str, used: Set[str]) -> bool:
+    """Whether every class, id and tag of the selector appears in the markup
+
+    Structure is not checked, so this can only keep a rule too many, never drop a used one.
+    """
+    simple = SELECTOR_PSEUDO.sub(' ', SELECTOR_ATTRIBUTE.sub(' ', selector))
+    return all(
+        (prefix + name if prefix else name.lower()) in used
+        for prefix, name in SELECTOR_NAME.findall(simple)
+    )
+
+
+def critical_rules(css: str, used: Set[str]) -> List[str]:
+    """Rules (and @media/@supports groups) of css that can match the used names"""
+    kept = []
+    keyframes = []
+    for prelude, body in css_rules(css):
+        if prelude.startswith('@media') or prelude.startswith('@supports'):
+            inner = critical_rules(body, used)
+            if inner:
+                kept.append(f"{prelude} {{ {' '.join(inner)} }}")
+        elif KEYFRAMES_NAME.match(prelude):
+            keyframes.append((KEYFRAMES_NAME.match(prelude).group(1), f"{prelude} {{ {body.strip()} }}"))
+        elif prelude.startswith('@'):
+            kept.append(f"{prelude} {{ {' '.join(line.strip() for line in body.strip().splitlines())} }}")
+        else:
+            selectors = [selector.strip() for selector in prelude.split(',') if selector_used(selector, used)]
+            if selectors:
+                declarations = ' '.join(line.strip() for line in body.strip().splitlines())
+                kept.append(f"{', '.join(selectors)} {{ {declarations} }}")
+
+    # Animations survive only when a kept rule runs them
+    text = ' '.join(kept)
+    kept += [rule for name, rule in keyframes if re.search(rf'\b{re.escape(name)}\b', text)]
+    return kept
+
+
+def critical_css(style_block: str, html: str) -> str:
+    """The rules of style_block that the markup can match, one per line"""
+    return '\n'.join(critical_rules(style_css(style_block), used_names(html)))
+
+
+def line_span(content: str, start: int, end: int) -> Tuple[int, int]:
+    """Widen an element span to its whole lines when nothing else shares them"""
+    line_start = content.rfind('\n', 0, start) + 1
+    line_end = content.find('\n', end)
+    line_end = len(content) if line_end == -1 else line_end + 1
+    if content[line_start:start].strip() or content[end:line_end].strip():
+        return start, end
+    return line_start, line_end
+
+
+def strip_inlined_styles(content: str) -> Tuple[str, int]:
+    """Drop the inlined copies of the shared sections; the first becomes the stylesheet link"""
+    styles = [
+        element for element in TemplateSpans(content).find_all('style')
+        if any(marker in element.inner(content) for marker in INLINE_MARKERS.values())
+    ]
+    if not styles:
+        return content, 0
+
+    edits = []
+    if SHARED_STYLESHEET_ASSET not in content:
+        edits.append((styles[0].start, styles[0].end, STYLESHEET_LINK))
+        styles = styles[1:]
+    edits += [(*line_span(content, element.start, element.end), '') for element in styles]
+    return apply_edits(content, edits), len(edits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Strip inlined list-page styles in favour of the shared stylesheet')
+    parser.add_argument(
+        '--project-root',
+        type=str,
+        default='.',
+        help='Path to project root (default: current directory)'
+    )
+    parser.add_argument(
+        '--dry-run',
+        action='store_true',
+        help='Only report the templates that would change'
+    )
+    args = parser.parse_args()
+
+    stage = StagedWrites()
+    templates_dir = os.path.join(args.project_root, 'templates')
+    for directory, _, files in os.walk(templates_dir):
+        for name in sorted(files):
+            if not name.endswith('.twig'):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            stripped, count = strip_inlined_styles(content)
+            if count:
+                stage.write(path, stripped)
+                print(f"✂️ {os.path.relpath(path, args.project_root)}: {count} inlined style block(s)")
+
+    if not len(stage):
+        print("✅ No inlined list-page styles found")
+    elif args.dry_run:
+        print(f"[DRY RUN] {len(stage)} templates would change")
+    else:
+        print(f"💾 Wrote {stage.commit()} files")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""
+Staged Writes
+Collects the files a codemod run produces and applies them in one batch
+
+Nothing touches the tree until commit(): every staged file is first written
+and fsynced to a temp file next to its target, and only when all of them
+succeeded are they renamed into place. A failed run leaves the tree as it was.
+"""
+
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# Mode for newly created files, as open(..., 'w') would give them
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+NEW_FILE_MODE = 0o666 & ~_UMASK
+
+
+class StagedWrites:
+    """In-memory staging area: target path -> (bytes, file to copy metadata from)"""
+
+    def __init__(self):
+        self.files: Dict[Path, Tuple[bytes, Optional[Path]]] = {}
+
+    def __len__(self) -> int:
+        return len(self.files)
+
+    @staticmethod
+    def key(path) -> Path:
+        return Path(os.path.abspath(path))
+
+    def write(self, path, content: str, encoding: str = 'utf-8'):
+        """Stage content for path (replaces anything staged for it before)"""
+        self.files[self.key(path)] = (content.encode(encoding), None)
+
+    def copy(self, source, destination):
+        """Stage a copy of source, keeping its metadata like shutil.copy2"""
+        source = self.key(source)
+        self.files[self.key(destination)] = (source.read_bytes(), source)
+
+    def read(self, path, encoding: str = 'utf-8') -> str:
+        """Read path as this run sees it: staged content first, then the disk"""
+        staged = self.files.get(self.key(path))
+        if staged is not None:
+            return staged[0].decode(encoding)
+        with open(path, 'r', encoding=encoding) as f:
+            return f.read()
+
+    def update(self, other: 'StagedWrites'):
+        """Merge another staging area into this one"""
+        self.files.update(other.files)
+
+    def discard(self):
+        self.files.clear()
+
+    def commit(self) -> int:
+        """Write every staged file to a temp file, then rename them all into place"""
+        temps = []
+        try:
+            for path, (data, stat_source) in self.files.items():
+                path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+                temps.append((tmp_path, path))
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                if stat_source is not None:
+                    shutil.copystat(stat_source, tmp_path)
+                elif path.exists():
+                    shutil.copymode(path, tmp_path)
+                else:
+                    os.chmod(tmp_path, NEW_FILE_MODE)
+        except BaseException:
+            for tmp_path, _ in temps:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+            raise
+
+        for tmp_path, path in temps:
+            os.replace(tmp_path, path)
+
+        # Persist the renames: one fsync per touched directory
+        for directory in {path.parent for _, path in temps}:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:
+                pass
+            finally:
+                os.close(fd)
+
+        count = len(temps)
+        self.files.clear()
+        return count
@@ -0,0 +1,154 @@
+"""
+Template Tokenizer
+Single-pass Twig/HTML tokenizer that indexes balanced element spans
+
+The whole template is scanned once, left to right, and every element is
+recorded with its open/close offsets. Lookups then run against that span
+index instead of backtracking DOTALL regexes.
+"""
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+
+VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'source', 'track', 'wbr'
+}
+RAW_TEXT_TAGS = {'script', 'style'}
+
+# Comments are skipped whole; quoted attribute values may contain '>'
+TOKEN_PATTERN = re.compile(
+    r'<!--.*?-->'
+    r'|{#.*?#}'
+    r'|<(?P<close>/)?(?P<tag>[a-zA-Z][\w-]*)(?P<attrs>(?:"[^"]*"|\'[^\']*\'|[^\'">])*)>',
+    re.DOTALL
+)
+ATTR_PATTERN = re.compile(r'([\w:@.-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s"\'>]+))')
+RAW_TEXT_END = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in RAW_TEXT_TAGS}
+
+
+class Element:
+    """A balanced element span: content[start:end] is the whole element"""
+
+    __slots__ = ('tag', 'attrs_text', 'start', 'open_end', 'close_start', 'end', 'parent', '_attrs')
+
+    def __init__(self, tag: str, attrs_text: str, start: int, open_end: int, parent: Optional['Element']):
+        self.tag = tag
+        self.attrs_text = attrs_text
+        self.start = start
+        self.open_end = open_end
+        self.close_start: Optional[int] = None
+        self.end: Optional[int] = None
+        self.parent = parent
+        self._attrs: Optional[Dict[str, str]] = None
+
+    @property
+    def attrs(self) -> Dict[str, str]:
+        """Attributes parsed lazily from the open tag"""
+        if self._attrs is None:
+            self._attrs = {}
+            for match in ATTR_PATTERN.finditer(self.attrs_text):
+                value = next((v for v in match.group(2, 3, 4) if v is not None), '')
+                self._attrs.setdefault(match.group(1).lower(), value)
+        return self._attrs
+
+    def inner(self, content: str) -> str:
+        """Text between the open and close tags"""
+        return content[self.open_end:self.close_start]
+
+    def contains(self, other: 'Element') -> bool:
+        return self.start <= other.start and other.end <= self.end
+
+
+class TemplateSpans:
+    """Span index of every balanced element in a template"""
+
+    def __init__(self, content: str):
+        self.content = content
+        self.elements: List[Element] = []
+        self._tokenize()
+
+    def _tokenize(self):
+        content = self.content
+        stack: List[Element] = []
+        pos = 0
+
+        while True:
+            match = TOKEN_PATTERN.search(content, pos)
+            if not match:
+                break
+            pos = match.end()
+
+            tag = match.group('tag')
+            if tag is None:
+                continue  # comment
+            tag = tag.lower()
+
+            if match.group('close'):
+                # Pop up to the matching open tag; stray close tags are ignored
+                for depth in range(len(stack) - 1, -1, -1):
+                    if stack[depth].tag == tag:
+                        element = stack[depth]
+                        element.close_start, element.end = match.start(), match.end()
+                        del stack[depth:]
+                        break
+                continue
+
+            parent = stack[-1] if stack else None
+            element = Element(tag, match.group('attrs'), match.start(), match.end(), parent)
+            self.elements.append(element)
+
+            if tag in VOID_TAGS or match.group('attrs').rstrip().endswith('/'):
+                element.close_start = element.end = match.end()
+            elif tag in RAW_TEXT_TAGS:
+                # Script and style bodies are not markup: jump straight to the close tag
+                end_match = RAW_TEXT_END[tag].search(content, pos)
+                if end_match:
+                    element.close_start, element.end = end_match.start(), end_match.end()
+                    pos = end_match.end()
+            else:
+                stack.append(element)
+
+    def find_all(self, tag: str, predicate: Optional[Callable[[Element], bool]] = None) -> List[Element]:
+        """Closed elements with the given tag, in document order"""
+        return [
+            element for element in self.elements
+            if element.tag == tag and element.end is not None and (predicate is None or predicate(element))
+        ]
+
+    def find_outermost(self, tag: str, predicate: Optional[Callable[[Element], bool]] = None) -> List[Element]:
+        """Like find_all, but drops matches nested inside an earlier match (as re.sub would)"""
+        result = []
+        for element in self.find_all(tag, predicate):
+            if not result or not result[-1].contains(element):
+                result.append(element)
+        return result
+
+
+def class_starts_with(prefix: str) -> Callable[[Element], bool]:
+    """Predicate matching the literal start of the class attribute (like '<div class="row g-4')"""
+    return lambda element: element.attrs.get('class', '').startswith(prefix)
+
+
+def class_equals(value: str) -> Callable[[Element], bool]:
+    """Predicate matching the exact class attribute"""
+    return lambda element: element.attrs.get('class', '') == value
+
+
+def apply_edits(content: str, edits: List[Tuple[int, int, str]]) -> str:
+    """Apply (start, end, replacement) edits made against the same content
+
+    Edits overlapping an earlier one are dropped. They are spliced from the end
+    so every offset stays valid.
+    """
+    accepted = []
+    last_end = -1
+    for start, end, replacement in sorted(edits, key=lambda edit: (edit[0], edit[1])):
+        if start < last_end:
+            continue
+        accepted.append((start, end, replacement))
+        last_end = max(end, start)
+
+    for start, end, replacement in reversed(accepted):
+        content = content[:start] + replacement + content[end:]
+    return content
@@ -1,7 +1,11 @@
 import os
-import re
+
+from project_index import ProjectIndex
+from shared_stylesheet import STYLESHEET_DEFERRED_LINK, critical_css, write_section
+from staged_writes import StagedWrites
 
 # Master CSS Block (extracted from user/index.html.twig)
+# Written to the "master" section of the shared stylesheet, never inlined into templates
 MASTER_CSS = """
     <style>
         /* =====================================================
@@ -657,7 +661,7 @@ ENTITIES = {
     }
 }
 
-def unify_styles(entity_name, config):
+def unify_styles(entity_name, config, index, stage):
     file_path = config['template']
     if not os.path.exists(file_path):
         print(f"❌ Template not found: {file_path}")
@@ -666,22 +670,18 @@ def unify_styles(entity_name, config):
     with open(file_path, 'r') as f:
         content = f.read()
 
+    # Block and <thead> spans come from the shared project index
+    facts = index.facts(file_path)
+    blocks = facts['blocks']
+
     # 1. Extract existing table headers
-    table_headers_match = re.search(r'<thead>(.*?)</thead>', content, re.DOTALL)
-    table_headers = table_headers_match.group(1) if table_headers_match else "<tr><th>ID</th><th>Acciones</th></tr>"
+    theads = facts['theads']
+    table_headers = content[theads[0][2]:theads[0][3]] if theads else "<tr><th>ID</th><th>Acciones</th></tr>"
 
     # 2. Extract existing modals or includes
-    modals = ""
-    # Simple heuristic: find includes that look like delete forms or modals
-    includes = re.findall(r'{{ include\(.*?\delete_form.*?\) }}', content)
-    # We won't keep the delete form include inside the table, but we might want to keep other modals
-    # Actually, the delete modal is usually handled by JS now, so we might not need the include if it was per-row
-    # But if there's a global modal, we should keep it.
-    
-    # Let's check for any modal divs defined in the body
-    modal_divs = re.findall(r'<div class="modal.*?>.*?</div>\s*</div>', content, re.DOTALL)
-    # This is risky, regex for HTML is bad. 
-    # Instead, we will assume standard structure and just provide the standard delete modal if not present
+    # The delete modal is usually handled by JS now, so per-row delete form includes are not kept.
+    # Scanning the body for modal divs with regex is risky (and slow), so we assume the standard
+    # structure and just provide the standard delete modal.
     
     modals = """
     <!-- Modal Delete (Standard) -->
@@ -737,34 +737,51 @@ def unify_styles(entity_name, config):
     """
 
     # 4. Replace Body Block
-    # Regex to find {% block body %}...{% endblock %}
-    # This is tricky with nested blocks, but usually body is top level
-    content = re.sub(r'{% block body %}.*?{% endblock %}', 
-                     f"{{% block body %}}\n{new_body}\n{{% endblock %}}", 
-                     content, flags=re.DOTALL)
+    # The index resolves {% block body %}...{% endblock %} with nesting taken into account
+    replacements = []
+    if 'body' in blocks:
+        start, end = blocks['body'][:2]
+        replacements.append((start, end, f"{{% block body %}}\n{new_body}\n{{% endblock %}}"))
 
     # 5. Replace Stylesheets Block
-    # We want to replace the entire stylesheets block to ensure we have the master CSS
+    # We want to replace the entire stylesheets block: only the master CSS rules the new body
+    # can match are inlined, the shared stylesheet brings the rest without blocking the render
     # But we must keep {{ parent() }}
+    # (plus the rows DataTables draws into the empty <tbody>)
+    critical = critical_css(MASTER_CSS, new_body + "<tr><td></td></tr>").replace('\n', '\n        ')
     new_stylesheets = f"""
 {{% block stylesheets %}}
     {{{{ parent() }}}}
-    {MASTER_CSS}
+    <style>
+        {critical}
+    </style>
+    {STYLESHEET_DEFERRED_LINK}
 {{% endblock %}}
     """
     
-    if "{% block stylesheets %}" in content:
-        content = re.sub(r'{% block stylesheets %}.*?{% endblock %}', 
-                         new_stylesheets, 
-                         content, flags=re.DOTALL)
-    else:
+    if 'stylesheets' in blocks:
+        start, end = blocks['stylesheets'][:2]
+        replacements.append((start, end, new_stylesheets))
+    elif 'body' in blocks:
         # Insert before body if not exists
-        content = content.replace("{% block body %}", f"{new_stylesheets}\n{{% block body %}}")
+        start = blocks['body'][0]
+        replacements.append((start, start, f"{new_stylesheets}\n"))
+
+    # Splice from the end so the earlier spans stay valid
+    for start, end, replacement in sorted(replacements, reverse=True):
+        content = content[:start] + replacement + content[end:]
 
-    with open(file_path, 'w') as f:
-        f.write(content)
+    stage.write(file_path, content)
     
     print(f"✅ Unified styles for {entity_name}")
 
-for entity, config in ENTITIES.items():
-    unify_styles(entity, config)
+if __name__ == "__main__":
+    index = ProjectIndex('.')
+    stage = StagedWrites()
+    write_section(stage, 'master', MASTER_CSS)
+    for entity, config in ENTITIES.items():
+        unify_styles(entity, config, index, stage)
+    index.save()
+
+    # Nothing is written until every template has been processed
+    print(f"💾 Wrote {stage.commit()} files")
@@ -1,20 +1,48 @@
 #!/usr/bin/env python3
 """
 Script para verificar que todos los FormTypes estén correctamente configurados para multi-tenant
+
+Uso:
+    python verificar_formtypes_multitenant.py
+    python verificar_formtypes_multitenant.py --incremental
 """
 
 import os
-import re
+import json
+import argparse
+
+from project_index import ProjectIndex
+
+# Incrementar si cambian las reglas de verificación, para invalidar los resultados guardados
+CACHE_VERSION = 1
+CACHE_FILE = '.verificar_formtypes_cache.json'
+
+def cargar_cache(cache_file):
+    """Cargar los resultados guardados por archivo (clave: ruta, validados por hash)"""
+    try:
+        with open(cache_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    
+    return data.get('results', {}) if data.get('version') == CACHE_VERSION else {}
 
-def verificar_formtype(file_path):
+def guardar_cache(cache_file, results):
+    """Guardar los resultados por archivo de forma atómica"""
+    tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        json.dump({'version': CACHE_VERSION, 'results': results}, f, ensure_ascii=False)
+    os.replace(tmp_file, cache_file)
+
+def verificar_formtype(file_path, index):
     """Verificar un FormType específico"""
     print(f"\n🔍 Verificando {os.path.basename(file_path)}...")
     
-    with open(file_path, 'r', encoding='utf-8') as f:
-        content = f.read()
+    # Los hechos del archivo vienen del índice compartido (solo se re-parsea si cambió)
+    facts = index.facts(file_path)
     
     # Verificar si usa EntityType
-    uses_entity_type = 'EntityType::class' in content
+    uses_entity_type = facts['uses_entity_type']
     
     if not uses_entity_type:
         print(f"   ✅ No usa EntityType - OK")
@@ -23,16 +51,16 @@ def verificar_formtype(file_path):
     print(f"   📋 Usa EntityType - verificando configuración...")
     
     # Verificar si tiene TenantManager inyectado
-    has_tenant_manager_import = 'use App\\Service\\TenantManager;' in content
-    has_tenant_manager_property = 'private TenantManager $tenantManager;' in content
-    has_tenant_manager_constructor = 'public function __construct(TenantManager $tenantManager)' in content
+    has_tenant_manager_import = facts['tenant_manager']['import']
+    has_tenant_manager_property = facts['tenant_manager']['property']
+    has_tenant_manager_constructor = facts['tenant_manager']['constructor']
     
     print(f"   - Import TenantManager: {'✅' if has_tenant_manager_import else '❌'}")
     print(f"   - Property TenantManager: {'✅' if has_tenant_manager_property else '❌'}")
     print(f"   - Constructor TenantManager: {'✅' if has_tenant_manager_constructor else '❌'}")
     
     # Verificar si todos los EntityType tienen 'em' configurado
-    entity_type_blocks = re.findall(r'->add\([^,]+,\s*EntityType::class,\s*\[(.*?)\]', content, re.DOTALL)
+    entity_type_blocks = facts['entity_type_blocks']
     
     all_have_em = True
     for i, block in enumerate(entity_type_blocks):
@@ -50,6 +78,20 @@ def verificar_formtype(file_path):
     return is_correct
 
 def main():
+    parser = argparse.ArgumentParser(description='Verificar la configuración multi-tenant de los FormTypes')
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help='Re-verificar solo los FormTypes cuyo contenido cambió desde la última ejecución'
+    )
+    parser.add_argument(
+        '--cache-file',
+        type=str,
+        default=CACHE_FILE,
+        help=f'Archivo de resultados guardados (default: {CACHE_FILE})'
+    )
+    args = parser.parse_args()
+    
     print("🔧 VERIFICACIÓN DE FORMTYPES - CONFIGURACIÓN MULTI-TENANT")
     print("=" * 60)
     
@@ -68,12 +110,28 @@ def main():
     print(f"📁 Encontrados {len(form_files)} FormTypes")
     
     results = []
+    index = ProjectIndex('.')
+    cache = cargar_cache(args.cache_file) if args.incremental else {}
+    new_cache = {}
     
-    # Verificar cada FormType
+    # Verificar cada FormType (en modo incremental, solo los que cambiaron)
     for form_file in sorted(form_files):
-        result = verificar_formtype(form_file)
+        digest = index.digest(form_file)
+        cached = cache.get(form_file)
+        
+        if cached and cached['sha1'] == digest:
+            result = cached['result']
+            print(f"\n♻️  {os.path.basename(form_file)} sin cambios - {'✅ CORRECTO' if result else '❌ NECESITA CORRECCIÓN'}")
+        else:
+            result = verificar_formtype(form_file, index)
+        
+        new_cache[form_file] = {'sha1': digest, 'result': result}
         results.append((os.path.basename(form_file), result))
     
+    index.save()
+    if args.incremental:
+        guardar_cache(args.cache_file, new_cache)
+    
     # Resumen final
     print("\n" + "=" * 60)
     print("📋 RESUMEN DE VERIFICACIÓN")